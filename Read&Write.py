@@ -1,25 +1,470 @@
-import numpy as np  # 有时用来判断列表维度，若无该库，请把 assert np.array(list).ndim == num 注释！
+TRUSTED_INPUT = False  # 设为 True 时跳过输入的维度检查
 
 
+def _check_dim(input_list, ndim):
+    """
+    cheap replacement of np.array(input_list).ndim == ndim, only looks at the first element instead of copying.
+    attention: an empty list is regarded as 1d, the same as np.array([]).ndim.
+    arrays (anything with an ndim attribute, e.g. numpy arrays) are checked by their own ndim
+
+    :param input_list: list, tuple or array, the input
+    :param ndim: int, 1 or 2
+    :return: bool, denote whether the input looks like a ndim list
+    """
+
+    if TRUSTED_INPUT:
+        return True
+
+    if hasattr(input_list, 'ndim'):  # 数组自带维度，不需要导入 numpy
+        return input_list.ndim == ndim
+
+    if not isinstance(input_list, (list, tuple)):
+        return False
+
+    if not input_list:
+        return ndim == 1
+
+    first = input_list[0]
+    if ndim == 1:
+        return not isinstance(first, (list, tuple))
+    else:  # ndim == 2
+        return isinstance(first, (list, tuple)) and not (first and isinstance(first[0], (list, tuple)))
+
+
+_COMPRESS_EXT = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'lzma'}
+# 文件头的正则；bz2 的 'BZh' 之后必须是块大小和数据块 (1AY&SY) 或空流结尾 (\x17rE8P\x90) 的标记，否则普通文本也会被当成 bz2
+_COMPRESS_MAGIC = [(b'\x1f\x8b', 'gzip'), (b'BZh[1-9](?:1AY&SY|\x17rE8P\x90)', 'bz2'), (b'\xfd7zXZ\x00', 'lzma')]
+
+
+def _strip_compress_ext(file_path):
+    """
+    './info.xlsx.gz' -> './info.xlsx', the real type of a compressed file
+    """
+
+    for ext in _COMPRESS_EXT:
+        if file_path.lower().endswith(ext):
+            return file_path[:-len(ext)]
+
+    return file_path
+
+
+def _compress_kind(file_path, detect=True):
+    """
+    find the compression of a file, by the magic bytes when it exists (and detect is True) or else by the extension
+
+    :param file_path: string, the path of this file
+    :param detect: bool, whether to read the magic bytes
+    :return: string, 'gzip', 'bz2', 'lzma', or None for a plain file
+    """
+
+    import os
+    import re
+
+    if detect and os.path.isfile(file_path):
+        with open(file_path, 'rb') as f:
+            head = f.read(10)
+        for magic, kind in _COMPRESS_MAGIC:
+            if re.match(magic, head):
+                return kind
+        if head:  # 非空且不是压缩格式
+            return None
+
+    for ext, kind in _COMPRESS_EXT.items():
+        if file_path.lower().endswith(ext):
+            return kind
+
+    return None
+
+
+def _open_file(file_path, mode='r', encoding=None, newline=None, kind=None, level=-1):
+    """
+    open a plain or compressed file, the data is (de)compressed incrementally by the stdlib codecs
+
+    :param file_path: string, the path of this file
+    :param mode: string, r, w, a with an optional b
+    :param encoding: string, the code of a text file
+    :param newline: string, the same as open()
+    :param kind: string, 'gzip', 'bz2', 'lzma' or None, 'auto' means _compress_kind(file_path)
+    :param level: int, the compression level when writing, -1 means the default of the codec
+    :return: file object
+    """
+
+    if kind == 'auto':
+        kind = _compress_kind(file_path, detect='w' not in mode)
+    if kind is None:
+        return open(file_path, mode, encoding=encoding, newline=newline) if 'b' not in mode \
+            else open(file_path, mode)
+
+    import importlib
+    codec = importlib.import_module(kind)
+    mode = mode if 'b' in mode else mode + 't'
+    kwargs = {} if 'b' in mode else {'encoding': encoding, 'newline': newline}
+    if level >= 0 and 'r' not in mode:
+        kwargs['preset' if kind == 'lzma' else 'compresslevel'] = level
+
+    return codec.open(file_path, mode, **kwargs)
+
+
+
+
+class _ColumnBuilder(object):
+    """
+    collect the cells of one column and infer the narrowest type while reading: bool -> int -> float -> str.
+    bool mixed with numbers is not a number column, it falls back like any other text.
+    text cells (csv) are parsed and fall back to str. typed cells (excel) are never parsed, a text cell
+    of excel falls back to object.
+    when a column falls back after some cells were parsed, lossy is set and the caller should re-read
+    the raw cells, because '01', '1.50' or 'false' (and the float 1.0 of excel) can not be rebuilt from the parsed values
+    """
+
+    def __init__(self, text=True):
+        from array import array
+        self.text = text
+        self.kind = 'bool'
+        self.values = array('b')
+        self.mask = bytearray()  # 1 表示缺失
+        self.missing = 0
+        self.lossy = False
+
+    def _promote(self, kind):
+        from array import array
+        if kind == 'int':
+            self.values = array('q', self.values)
+        elif kind == 'float':
+            self.values = array('d', self.values)
+        else:  # str or object
+            if len(self.mask) - self.missing > 1:  # 除了当前单元格，之前已经解析过非空单元格
+                self.lossy = True
+            values = self.values
+            if self.kind == 'bool':
+                values = [bool(v) for v in values]  # 不要把 int8 的 0/1 当作结果
+            if kind == 'str':
+                self.values = ['' if m else str(v) for v, m in zip(values, self.mask)]
+            else:
+                self.values = [None if m else v for v, m in zip(values, self.mask)]
+        self.kind = kind
+
+    def _parse(self, cell):
+        """
+        :return: (kind, value), the narrowest kind which can hold this cell
+        """
+
+        if isinstance(cell, bool):
+            return 'bool', cell
+        if isinstance(cell, int):
+            return ('int', cell) if -2 ** 63 <= cell < 2 ** 63 else ('float', float(cell))
+        if isinstance(cell, float):  # excel 中的数字都是 float
+            if not self.text and cell.is_integer() and -2 ** 63 <= cell < 2 ** 63:
+                return 'int', int(cell)
+            return 'float', cell
+        if not isinstance(cell, str) or not self.text:  # excel 的单元格自带类型，文本单元格 '01234' 不是数字
+            return 'object', cell
+
+        tmp = cell.strip()
+        if tmp in ('True', 'true', 'TRUE', 'False', 'false', 'FALSE'):
+            return 'bool', tmp[0] in 'Tt'
+        try:
+            return self._parse(int(tmp))
+        except ValueError:
+            pass
+        try:
+            return 'float', float(tmp)
+        except ValueError:
+            return 'str', cell
+
+    def add(self, cell):
+        if cell is None or cell == '':
+            self.missing += 1
+            self.mask.append(1)
+            self.values.append('' if self.kind == 'str' else None if self.kind == 'object' else 0)
+            return
+
+        self.mask.append(0)
+        if self.kind in ('str', 'object'):
+            self.values.append(cell)
+            return
+
+        kind, value = self._parse(cell)
+        order = ['bool', 'int', 'float', 'str' if self.text else 'object']
+        if kind not in order:
+            kind = order[-1]
+        if kind != self.kind and 'bool' in (kind, self.kind) and len(self.mask) - self.missing > 1:
+            kind = order[-1]  # bool 与数字混合，不能当作数字列
+        if order.index(kind) > order.index(self.kind):
+            self._promote(kind)
+        if self.kind in ('str', 'object'):
+            value = cell
+        self.values.append(value)
+
+    def to_array(self, max_str_len=32):
+        """
+        :param max_str_len: int, strings not longer than it are stored as fixed-width unicode, otherwise object
+        :return: np.ndarray, or np.ma.MaskedArray when some cells are missing
+        """
+
+        import numpy as np
+        if self.kind == 'bool':
+            data = np.frombuffer(self.values.tobytes(), dtype=np.int8).astype(np.bool_)
+        elif self.kind == 'int':
+            data = np.frombuffer(self.values.tobytes(), dtype=np.int64).copy()
+        elif self.kind == 'float':
+            data = np.frombuffer(self.values.tobytes(), dtype=np.float64).copy()
+        elif self.kind == 'str' and max([len(v) for v in self.values] or [0]) <= max_str_len:
+            data = np.array(self.values, dtype='U%d' % max(max([len(v) for v in self.values] or [1]), 1))
+        else:
+            data = np.empty(len(self.values), dtype=object)
+            data[:] = self.values
+
+        if self.missing:
+            return np.ma.MaskedArray(data, mask=np.frombuffer(bytes(self.mask), dtype=np.uint8).astype(np.bool_))
+
+        return data
+
+
+def column_memory(column_dict):
+    """
+    compare the memory of columns returned by export_type='columns' with tuples of python objects
+
+    :param column_dict: dict, {name: np.ndarray}
+    :return: dict, bytes of arrays, estimated bytes of tuples and their ratio
+    """
+
+    import sys
+    import numpy as np
+
+    array_bytes = 0
+    tuple_bytes = 0
+    for data in column_dict.values():
+        array_bytes += data.nbytes
+        if isinstance(data, np.ma.MaskedArray):
+            array_bytes += data.mask.nbytes if data.mask is not np.ma.nomask else 0
+            data = data.data
+
+        tuple_bytes += sys.getsizeof(())
+        if data.dtype.kind in 'biuf':  # 每个元素一个 python 对象加一个指针
+            obj_size = sys.getsizeof(data.dtype.type(0).item()) if data.dtype.kind != 'b' else 0
+            tuple_bytes += len(data) * (8 + obj_size)
+        else:
+            tuple_bytes += sum(8 + sys.getsizeof(v) for v in data.tolist())
+
+    return {'array_bytes': array_bytes, 'tuple_bytes': tuple_bytes,
+            'ratio': float(tuple_bytes) / array_bytes if array_bytes else 0.0}
+
 # ==============================================================================
 # 几个调用实例：
 # result = read_xls_file('./info.xlsx', name_list=['姓名', '班级'])  # 返回字典型、表单切片的数据
 # result = read_xls_file('./info.xls', sheet_var='StudentInfo', name_list=['姓名', '班级'],
 #          category='col', begin=0, export_type='list')  # 返回列表型、StudentInfo表单、指定列的数据（还包括了列名）
+# with ExcelReader('./info.xlsx') as reader:  # 只打开一次，可以多次查询不同的表单和列
+#     for row in reader.iter_rows('StudentInfo', name_list=['姓名', '班级']):
 # 
 # write_xls_file([[[1,2,3], [1,2]], [[4]]], './test.xlsx', sheet_list=['tmp1', 'tmp2'])
 # write_xls_file([[[1,2,3], [1,2], [4]]], './test.xls', category='col')
+# with ExcelWriter('./big.xlsx') as writer:  # 逐行写入，超过行数上限自动新建表单
+#     writer.add_sheet('data')
+#     writer.write_rows(row_iter)
 #
 # result = read_csv_file('./info.csv', name_list=['姓名', '班级'])  # 返回字典型、表单切片的数据
+# for row in iter_csv_file('./info.csv', name_list=['姓名', '班级'], encoding='utf-8'):  # 逐行读取表单切片，不占用大量内存
+# for row in iter_csv_file('./info.csv.gz', encoding='utf-8'):  # .gz/.bz2/.xz 按扩展名或文件头自动解压，所有读写函数通用
 #
 # write_csv_file([['1','2','3'], [1,2], [4]], './test.csv', mode='w')
 # write_csv_file([['1','2','3'], [1,2], [4]], './test.csv', mode='a', category='col')
+# write_csv_file(row_iter, './test.csv.xz', compress_level=1)  # 写入时压缩，可以设置压缩等级
 #
 # result = read_txt_file('./test.txt', code_type='utf-16')
 # result = read_txt_file('./test.txt', n_num=10)  # 读取以'\n'为分割方式的前10行文本
+# with TxtLineReader('./big.txt', index_path='./big.idx') as reader:  # 行索引保存后再次打开无需扫描
+#     result = reader.lines(100000, 100010)  # 直接读取第100000到100009行
+#
+# for file_path, record, err in iter_files('./data/**/*.csv', workers=4):  # 多进程读取整个目录，记录带有来源文件，出错的文件作为结果返回
+#
+# result = await read_csv_file_async('./info.csv', export_type='list')  # 在 asyncio 中使用，不阻塞事件循环
+# async for batch in iter_csv_file_async('./info.csv', batch_size=1000):  # 逐批返回，取消或中断时自动关闭文件
 #
 # write_txt_file(['I love nlp', 'hello world'], './test.txt')
 # ==============================================================================
+class ExcelReader(object):
+    """
+    a reading session of one .xls or .xlsx file, the workbook is opened once and serves many queries.
+    .xls is opened by xlrd with on_demand, .xlsx by openpyxl in read_only mode which streams rows,
+    so memory stays flat for large sheets. the header of each sheet is indexed once
+    """
+
+    def __init__(self, file_path):
+        """
+        :param file_path: string, the path of this file, .gz, .bz2 and .xz are decompressed automatically
+        """
+
+        self.file_path = file_path
+        self._header_dict = {}  # {sheet name: (header, {name: index})}
+        self._spool = None
+        source = file_path
+        if _compress_kind(file_path):  # 表格需要随机访问，先解压到内存，过大时转存临时文件
+            import shutil
+            import tempfile
+            self._spool = tempfile.SpooledTemporaryFile(max_size=1 << 26)
+            with _open_file(file_path, 'rb', kind='auto') as f:
+                shutil.copyfileobj(f, self._spool, 1 << 20)
+            self._spool.seek(0)
+            source = self._spool
+
+        if _strip_compress_ext(file_path).lower().endswith(('.xlsx', '.xlsm')):
+            from openpyxl import load_workbook
+            self._xlrd = False
+            self.book = load_workbook(source, read_only=True, data_only=True)
+        else:
+            import xlrd
+            self._xlrd = True
+            if self._spool is None:
+                self.book = xlrd.open_workbook(file_path, on_demand=True)
+            else:
+                self.book = xlrd.open_workbook(file_contents=self._spool.read(), on_demand=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._xlrd:
+            self.book.release_resources()
+        else:
+            self.book.close()
+        if self._spool is not None:
+            self._spool.close()
+
+    def sheet_names(self):
+        """
+        :return: 1d list, names of all sheets
+        """
+
+        return self.book.sheet_names() if self._xlrd else self.book.sheetnames
+
+    def sheet_name(self, sheet_var=0):
+        """
+        :param sheet_var: string or int, the name or index of a sheet
+        :return: string, the name of this sheet
+        """
+
+        return self.sheet_names()[sheet_var] if isinstance(sheet_var, int) else sheet_var
+
+    def iter_all(self, sheet_var=0):
+        """
+        iterate all rows of a sheet, empty cells are ''
+
+        :param sheet_var: string or int, the name or index of a sheet
+        :return: generator, lists of cells
+        """
+
+        if self._xlrd:
+            s = self.book.sheet_by_index(sheet_var) if isinstance(sheet_var, int) \
+                else self.book.sheet_by_name(sheet_var)
+            for i in range(s.nrows):
+                yield s.row_values(i)
+        else:
+            ws = self.book[self.sheet_name(sheet_var)]
+            for row in ws.iter_rows(values_only=True):
+                yield ['' if cell is None else cell for cell in row]
+
+    def header(self, sheet_var=0):
+        """
+        :param sheet_var: string or int, the name or index of a sheet
+        :return: (1d list, dict), the first row and {name: column index}, the first cell wins for same names
+        """
+
+        name = self.sheet_name(sheet_var)
+        if name not in self._header_dict:
+            header = next(self.iter_all(sheet_var), [])
+            index_dict = {}
+            for j, cell in enumerate(header):
+                index_dict.setdefault(str(cell).strip(), j)
+            self._header_dict[name] = (header, index_dict)
+
+        return self._header_dict[name]
+
+    def _resolve(self, sheet_var, name_list):
+        """
+        :return: 2d list, [(name, index),] of names found in the header, all columns when name_list is []
+        """
+
+        header, index_dict = self.header(sheet_var)
+        if not name_list:
+            return [(str(cell).strip(), j) for j, cell in enumerate(header)]
+
+        return [(name, index_dict[name]) for name in name_list if name in index_dict]
+
+    def iter_rows(self, sheet_var=0, name_list=[], begin=1, batch_size=0):
+        """
+        yield rows which only keep the columns in name_list, in the order of name_list
+
+        :param sheet_var: string or int, the name or index of a sheet
+        :param name_list: 1d list, consists of names of columns, [] means all columns
+        :param begin: int, the beginning row (the header is row 0)
+        :param batch_size: int, yield lists of batch_size rows when it is positive
+        :return: generator, tuples of cells, or lists of them
+        """
+
+        import itertools
+
+        pos_list = [pos for _, pos in self._resolve(sheet_var, name_list)]
+        if not pos_list:
+            return
+
+        rows = itertools.islice(self.iter_all(sheet_var), max(begin, 0), None)
+        rows = (tuple([row[j] if j < len(row) else '' for j in pos_list]) for row in rows)
+        if batch_size <= 0:
+            for row in rows:
+                yield row
+        else:
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    break
+                yield batch
+
+    def columns(self, sheet_var=0, name_list=[], begin=1):
+        """
+        read the columns in name_list in one pass
+
+        :param sheet_var: string or int, the name or index of a sheet
+        :param name_list: 1d list, consists of names of columns, [] means all columns
+        :param begin: int, the beginning position of each column (the header is position 0)
+        :return: 2d list, [(name, column tuple),] in the order of name_list
+        """
+
+        pos_list = self._resolve(sheet_var, name_list)
+        if not pos_list:
+            return []
+
+        col_list = list(zip(*self.iter_rows(sheet_var, name_list, begin=0)))
+        if not col_list:
+            col_list = [() for _ in pos_list]
+
+        return [(pos_list[k][0], col_list[k][begin:]) for k in range(len(pos_list))]
+
+    def find_rows(self, sheet_var=0, name_list=[], begin=1):
+        """
+        read the rows whose first cell is in name_list in one pass
+
+        :param sheet_var: string or int, the name or index of a sheet
+        :param name_list: 1d list, consists of names in the first column
+        :param begin: int, the beginning position of each row
+        :return: 2d list, [(name, row tuple),] in the order of name_list
+        """
+
+        name_coll = set(name_list)
+        row_dict = {}
+        for row in self.iter_all(sheet_var):
+            if row:
+                name = str(row[0]).strip()
+                if name in name_coll and name not in row_dict:
+                    row_dict[name] = tuple(row)
+
+        return [(name, row_dict[name][begin:]) for name in name_list if name in row_dict]
+
+
 def read_xls_file(file_path, sheet_var=0, name_list=[], category='', begin=1, export_type='dict'):
     """
     read only one .xls or .xlsx file and obtain the specific content
@@ -29,186 +474,438 @@ def read_xls_file(file_path, sheet_var=0, name_list=[], category='', begin=1, ex
     :param name_list: 1d list, consists of names
     :param category: string, process by rows or columns or table slice(default and recommend)
     :param begin: int, the beginning position of a row or column list, but invalid when name_list is []
-    :param export_type: string, denote the type of data
+    :param export_type: string, denote the type of data, including dict, list and columns,
+                        columns returns {name: numpy array} whose dtype is inferred, see column_memory
     :return: dict or 2d list, result from this excel
     """
 
-    assert np.array(name_list).ndim == 1
+    assert _check_dim(name_list, 1)
     assert isinstance(category, str)
     assert isinstance(begin, int)
     assert isinstance(export_type, str)
 
-    result = {} if export_type == 'dict' else []
+    result = {} if export_type in ['dict', 'columns'] else []
     try:
-        import xlrd
-        er = xlrd.open_workbook(file_path)
-        if isinstance(sheet_var, int):
-            s = er.sheet_by_index(sheet_var)
-        else:
-            s = er.sheet_by_name(sheet_var)
-
-        if name_list:  # 有指定名称，说明要导出 n 行或 n 列
-            if category == 'col':
-                for name in name_list:
-                    pos = -1
-                    for j in range(s.ncols):
-                        if str(s.cell_value(0, j)).strip() == name:
-                            pos = j
-                            break
-
-                    if pos >= 0:
+        with ExcelReader(file_path) as reader:
+            if export_type == 'columns':  # {列名: numpy 数组}，每列推断类型
+                pos_list = reader._resolve(sheet_var, name_list)
+                builder_list = [_ColumnBuilder(text=False) for _ in pos_list]
+                col_names = [name for name, _ in pos_list] if name_list else []
+                for row in reader.iter_rows(sheet_var, col_names, begin):
+                    for k in range(len(builder_list)):
+                        builder_list[k].add(row[k])
+
+                lossy_list = [k for k in range(len(pos_list)) if builder_list[k].lossy]
+                if lossy_list:  # 先解析成数字后又变成 object 的列，重新读取原始单元格
+                    for k in lossy_list:
+                        builder_list[k] = _ColumnBuilder(text=False)
+                        builder_list[k]._promote('object')
+                    for row in reader.iter_rows(sheet_var, col_names, begin):
+                        for k in lossy_list:
+                            builder_list[k].add(row[k])
+
+                for k in range(len(pos_list)):
+                    result[pos_list[k][0]] = builder_list[k].to_array()
+
+                return result
+
+            if name_list:  # 有指定名称，说明要导出 n 行或 n 列
+                if category in ['col', 'row']:
+                    if category == 'col':
+                        pair_list = reader.columns(sheet_var, name_list, begin)
+                    else:
+                        pair_list = reader.find_rows(sheet_var, name_list, begin)
+
+                    for name, tmp in pair_list:
                         if isinstance(result, dict):
-                            result[name] = tuple(s.col_values(pos)[begin:])
+                            result[name] = tmp
                         else:  # list
-                            result.append(tuple(s.col_values(pos)[begin:]))
+                            result.append(tmp)
 
-            elif category == 'row':
-                for name in name_list:
-                    pos = -1
-                    for i in range(s.nrows):
-                        if str(s.cell_value(i, 0)).strip() == name:
-                            pos = i
-                            break
+                else:  # table slice [(col1, col2, col3),] 每一行元素按照 name_list 的顺序排列,每一行是元组
+                    tmp_list = list(reader.iter_rows(sheet_var, name_list, begin))
 
-                    if pos >= 0:
-                        if isinstance(result, dict):
-                            result[name] = tuple(s.row_values(pos)[begin:])
-                        else:  # list
-                            result.append(tuple(s.row_values(pos)[begin:]))
+                    if isinstance(result, dict):
+                        result['slice'] = tmp_list
+                    else:
+                        result = tmp_list
 
-            else:  # table slice [(col1, col2, col3),] 每一行元素按照 name_list 的顺序排列,每一行是元组
-                tmp_data = read_xls_file(file_path=file_path, sheet_var=sheet_var, name_list=name_list,
-                                         category='col', begin=begin, export_type='list')
-                tmp_list = list(zip(*tmp_data))
+            else:  # 没有指定名称，返回全部表格数据
+                tmp_list = [tuple(row) for row in reader.iter_all(sheet_var)]
+                if category == 'col':  # 返回多列构成的二维列表
+                    tmp_list = list(zip(*tmp_list))
 
                 if isinstance(result, dict):
-                    result['slice'] = tmp_list
+                    result[reader.sheet_name(sheet_var)] = tmp_list
                 else:
                     result = tmp_list
 
-        else:  # 没有指定名称，返回全部表格数据
-            if category == 'col':  # 返回多列构成的二维列表
-                tmp_list = [tuple(s.col_values(j)) for j in range(s.ncols)]
-            else:    # category != 'col', 返回多行构成的二维列表
-                tmp_list = [tuple(s.row_values(i)) for i in range(s.nrows)]
-
-            if isinstance(result, dict):
-                sheet_name = er.sheet_names()[0]
-                result[sheet_name] = tmp_list
-            else:
-                result = tmp_list
-
     except Exception as err:
         print(err)
 
     return result
 
 
-def write_xls_file(info_list, file_path, sheet_list=['Sheet1'],  category='row'):
-    """
-    write .xls or .xlsx file with organized input
+_SKIP = object()  # 按列写 .xls 时补齐用的占位，不写入单元格
 
-    :param info_list: 3d list, consists of all information (sheet, table, content)
-    :param file_path: string, the path of this file
-    :param sheet_list: 1d list, consists of names of these sheets
-    :param category: string, insert by rows or columns
-    :return: no essential return value
+
+class ExcelWriter(object):
     """
+    streaming writer of .xls or .xlsx files, rows are written one by one and never kept by this object.
+    .xlsx uses openpyxl in write_only mode, .xls uses xlwt and flushes finished rows regularly.
+    when a sheet reaches the row limit of the format, a new sheet named name_2, name_3... is created
+    """
+
+    XLS_MAX_ROWS = 65536
+    XLSX_MAX_ROWS = 1048576
 
-    def transpose(sub_info_list):
+    def __init__(self, file_path, max_rows=-1, compress_level=-1):
         """
-        from [row, col] to [col, row], both input and output are 2d list
+        :param file_path: string, the path of this file, ending with .gz, .bz2 or .xz compresses it
+        :param max_rows: int, the max rows of each sheet, -1 means the limit of the format
+        :param compress_level: int, the compression level, -1 means the default of the codec
         """
-        col_num = len(sub_info_list)
-        size = max([len(tmp) for tmp in sub_info_list])
 
-        for j in range(col_num):  # padding
-            length = len(sub_info_list[j])
-            if length < size:
-                sub_info_list[j].extend(['' for _ in range(size-length)])
+        import time
+
+        self.file_path = file_path
+        self.compress_level = compress_level
+        real_path = _strip_compress_ext(file_path)
+        self._xlsx = real_path[-5:].find('.xlsx') != -1
+        if not self._xlsx and real_path[-5:].find('.xls') == -1:
+            raise ValueError('no such file type')
+
+        limit = self.XLSX_MAX_ROWS if self._xlsx else self.XLS_MAX_ROWS
+        self.max_rows = min(max_rows, limit) if max_rows > 0 else limit
+        self.row_count = 0
+        self.sheet_count = 0
+        self._start = time.time()
+        self._sheet = None
+        self._sheet_name = None
+        self._part = 0
+        self._row = 0  # 当前表单中的下一行
+
+        if self._xlsx:
+            from openpyxl import Workbook
+            self.book = Workbook(write_only=True)
+        else:
+            import xlwt
+            self.style = xlwt.XFStyle()  # 格式信息，所有单元格共用
+            font = xlwt.Font()  # 字体基本设置
+            font.name = u'宋体'
+            font.color = 'black'
+            font.height = 220  # 字体大小，220就是11号字体
+            self.style.font = font
+
+            alignment = xlwt.Alignment()  # 设置字体在单元格的位置
+            alignment.horz = xlwt.Alignment.HORZ_CENTER  # 水平方向
+            alignment.vert = xlwt.Alignment.VERT_CENTER  # 竖直方向
+            self.style.alignment = alignment
+
+            self.book = xlwt.Workbook()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+
+    def _new_sheet(self):
+        if self._part:  # 超出行数限制后的续表
+            name = '%s_%d' % (self._sheet_name[:28], self._part + 1)
+        else:
+            name = self._sheet_name
+
+        if self._xlsx:
+            self._sheet = self.book.create_sheet(name)
+        else:
+            if self._sheet is not None:
+                self._sheet.flush_row_data()
+            self._sheet = self.book.add_sheet(name)
+
+        self._part += 1
+        self._row = 0
+        self.sheet_count += 1
+
+    def add_sheet(self, sheet_name):
+        """
+        start a new sheet, following rows are written into it
+
+        :param sheet_name: string, the name of this sheet
+        :return: no essential return value
+        """
+
+        self._sheet_name = sheet_name
+        self._part = 0
+        self._new_sheet()
+
+    def write_row(self, row):
+        """
+        :param row: iterable, cells of one row
+        :return: no essential return value
+        """
+
+        if self._sheet is None:
+            self.add_sheet('Sheet1')
+        elif self._row >= self.max_rows:
+            self._new_sheet()
+
+        if self._xlsx:
+            self._sheet.append([None if cell is _SKIP else cell for cell in row])
+        else:
+            xls_row = self._sheet.row(self._row)
+            for j, cell in enumerate(row):
+                if cell is not _SKIP:
+                    xls_row.write(j, cell, self.style)
+            if self._row % 1000 == 999:  # 把写完的行序列化，释放单元格对象
+                self._sheet.flush_row_data()
+
+        self._row += 1
+        self.row_count += 1
+
+    def write_rows(self, rows):
+        """
+        :param rows: iterable, consists of rows
+        :return: int, the number of rows written
+        """
+
+        num = 0
+        for row in rows:
+            self.write_row(row)
+            num += 1
+
+        return num
+
+    def close(self):
+        """
+        save the file
+
+        :return: dict, rows, sheets, seconds and rows per second
+        """
+
+        import time
+
+        if self._sheet is None:
+            self.add_sheet('Sheet1')
 
-        rev_list = [[sub_info_list[j][i] for j in range(col_num)] for i in range(size)]
+        kind = _compress_kind(self.file_path, detect=False)
+        if kind is None:
+            self.book.save(self.file_path)
+        else:  # zip 格式需要可回退的文件，先存到临时文件再压缩
+            import shutil
+            import tempfile
+            with tempfile.SpooledTemporaryFile(max_size=1 << 26) as tmp:
+                self.book.save(tmp)
+                tmp.seek(0)
+                with _open_file(self.file_path, 'wb', kind=kind, level=self.compress_level) as wr:
+                    shutil.copyfileobj(tmp, wr, 1 << 20)
+        seconds = time.time() - self._start
 
-        return rev_list
+        return {'rows': self.row_count, 'sheets': self.sheet_count, 'seconds': seconds,
+                'rows_per_second': self.row_count / seconds if seconds > 0 else 0.0}
+
+
+def _transpose_rows(col_list, fill):
+    """
+    from [col, row] to rows without changing the input, short columns are padded with fill
+    """
+
+    import itertools
+    return itertools.zip_longest(*col_list, fillvalue=fill)
+
+
+def write_xls_file(info_list, file_path, sheet_list=['Sheet1'],  category='row', compress_level=-1):
+    """
+    write .xls or .xlsx file with organized input
+
+    :param info_list: 3d list, consists of all information (sheet, table, content)
+    :param file_path: string, the path of this file, ending with .gz, .bz2 or .xz compresses it
+    :param sheet_list: 1d list, consists of names of these sheets
+    :param category: string, insert by rows or columns
+    :param compress_level: int, the compression level, -1 means the default of the codec
+    :return: no essential return value
+    """
 
     assert isinstance(info_list, list)
-    assert np.array(sheet_list).ndim == 1
+    assert _check_dim(sheet_list, 1)
     assert isinstance(category, str)
     assert len(info_list) == len(sheet_list)
 
     try:
-        if file_path[-5:].find('.xlsx') != -1:
-            from openpyxl import Workbook
-            from openpyxl.styles import Font
-            font = Font(u'宋体', size=11)
-            wb = Workbook()
+        real_path = _strip_compress_ext(file_path)
+        if real_path[-5:].find('.xls') == -1:
+            print('warning: no such file type')
+            return
 
-            for k in range(len(sheet_list)):
-                if k == 0:
-                    sheet = wb.active
-                else:
-                    sheet = wb.create_sheet(sheet_list[k])
+        if not sheet_list:
+            print('warning: no sheet')
+            return
 
-                sheet.title = sheet_list[k]
-                sheet.font = font
+        fill = '' if real_path[-5:].find('.xlsx') != -1 else _SKIP  # .xls 按列写时不补空单元格
+        writer = ExcelWriter(file_path, compress_level=compress_level)
+        for k in range(len(sheet_list)):
+            writer.add_sheet(sheet_list[k])
+            if category == 'row':
+                writer.write_rows(info_list[k])
+            else:  # col
+                writer.write_rows(_transpose_rows(info_list[k], fill))
 
-                if category == 'row':
-                    tmp_list = info_list[k]
-                else:  # col
-                    tmp_list = transpose(info_list[k])
+        writer.close()
+        print('write excel successfully')
 
-                for tmp in tmp_list:
-                    sheet.append(tmp)
+    except Exception as err:
+        print(err)
 
-            if sheet_list:
-                wb.save(file_path)
-                print('write excel successfully')
-            else:
-                print('warning: no sheet')
 
-        elif file_path[-5:].find('.xls') != -1:
-            import xlwt
-            style = xlwt.XFStyle()  # 格式信息
-            font = xlwt.Font()  # 字体基本设置
-            font.name = u'宋体'
-            font.color = 'black'
-            font.height = 220  # 字体大小，220就是11号字体
-            style.font = font
+def _csv_rows(file_path, encoding=None, dialect='excel', **fmtparams):
+    """
+    iterate rows of a .csv file one by one, the file is closed when the iteration stops
+    """
 
-            alignment = xlwt.Alignment()  # 设置字体在单元格的位置
-            alignment.horz = xlwt.Alignment.HORZ_CENTER  # 水平方向
-            alignment.vert = xlwt.Alignment.VERT_CENTER  # 竖直方向
-            style.alignment = alignment
+    import csv
+    with _open_file(file_path, 'r', encoding=encoding, newline='', kind='auto') as f:
+        for row in csv.reader(f, dialect, **fmtparams):
+            yield row
 
-            wb = xlwt.Workbook()
 
-            for k in range(len(sheet_list)):
-                s = wb.add_sheet(sheet_list[k])
+def _header_index(header, name_list):
+    """
+    resolve names to indexes by the header, the first cell wins when names repeat
 
-                if category == 'row':  # 一行一行写
-                    for i in range(len(info_list[k])):
-                        for j in range(len(info_list[k][i])):
-                            s.write(i, j, info_list[k][i][j], style)
+    :return: 2d list, [(name, index),] in the order of name_list, names not in the header are dropped
+    """
 
-                else:  # col, 一列一列写
-                    for j in range(len(info_list[k])):
-                        for i in range(len(info_list[k][j])):
-                            s.write(i, j, info_list[k][j][i], style)
+    index_dict = {}
+    for j, cell in enumerate(header):
+        index_dict.setdefault(str(cell).strip(), j)
 
-            if sheet_list:
-                wb.save(file_path)
-                print('write excel successfully')
-            else:
-                print('warning: no sheet')
+    return [(name, index_dict[name]) for name in name_list if name in index_dict]
 
-        else:
-            print('warning: no such file type')
 
-    except Exception as err:
-        print(err)
+def iter_csv_file(file_path, name_list=[], begin=1, batch_size=0, encoding=None, dialect='excel', **fmtparams):
+    """
+    read a .csv file in a single pass and yield rows one by one (or in batches), only the columns in
+    name_list are kept, which is the streaming version of the table slice of read_csv_file
+
+    :param file_path: string, the path of this file
+    :param name_list: 1d list, consists of names of columns, [] means all columns
+    :param begin: int, the beginning row (the header is row 0), but invalid when name_list is []
+    :param batch_size: int, yield lists of batch_size rows when it is positive
+    :param encoding: string, the code of this file, None means the default of the system
+    :param dialect: string or csv.Dialect, the same as csv.reader, fmtparams are passed to csv.reader too
+    :return: generator, tuples of cells, or lists of them
+    """
 
+    assert _check_dim(name_list, 1)
+    assert isinstance(begin, int)
+    assert isinstance(batch_size, int)
+
+    import itertools
+
+    rows = _csv_rows(file_path, encoding, dialect, **fmtparams)
+    if name_list:
+        header = next(rows, None)
+        if header is None:
+            return
+
+        pos_list = [pos for _, pos in _header_index(header, name_list)]
+        if not pos_list:
+            return
+
+        rows = itertools.islice(itertools.chain([header], rows), max(begin, 0), None)
+        rows = (tuple([row[j] if j < len(row) else '' for j in pos_list]) for row in rows)  # 缺失的单元格补空
+    else:
+        rows = (tuple(row) for row in rows)
+
+    if batch_size <= 0:
+        for row in rows:
+            yield row
+    else:
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            yield batch
+
+
+def iter_csv_columns(file_path, name_list=[], begin=1, encoding=None, dialect='excel', spool=True,
+                     chunk_size=65536, **fmtparams):
+    """
+    yield columns of a .csv file one by one, only one column is kept in memory instead of the transposed table.
+    with spool the file is read once and the columns are written in chunks to one temp file, which costs temp
+    disk space about the size of the selected columns; without spool every column needs its own pass of the file,
+    which costs no disk but N full reads (and decompressions) for N columns
+
+    :param file_path: string, the path of this file
+    :param name_list: 1d list, consists of names of columns, [] means all columns
+    :param begin: int, the beginning position of each column (the header is position 0)
+    :param encoding: string, the code of this file, None means the default of the system
+    :param dialect: string or csv.Dialect, the same as csv.reader, fmtparams are passed to csv.reader too
+    :param spool: bool, read the file once and keep the columns in a temp file, or read it once per column
+    :param chunk_size: int, the number of cells of a column kept in memory before they are written when spooling
+    :return: generator, (name, column tuple)
+    """
 
-def read_csv_file(file_path, name_list=[], category='', begin=1, export_type='dict'):
+    assert _check_dim(name_list, 1)
+    assert isinstance(begin, int)
+    assert isinstance(chunk_size, int) and chunk_size > 0
+
+    import itertools
+
+    rows = _csv_rows(file_path, encoding, dialect, **fmtparams)
+    header = next(rows, None)
+    if header is None:
+        return
+
+    if name_list:
+        pos_list = _header_index(header, name_list)
+    else:
+        pos_list = [(str(cell).strip(), j) for j, cell in enumerate(header)]
+
+    if not spool:
+        rows.close()
+        for name, j in pos_list:
+            rows = itertools.islice(_csv_rows(file_path, encoding, dialect, **fmtparams), max(begin, 0), None)
+            yield name, tuple([row[j] if j < len(row) else '' for row in rows])
+        return
+
+    import pickle
+    import tempfile
+
+    with tempfile.TemporaryFile() as tmp:
+        offset_list = [[] for _ in pos_list]  # 每一列各个分块在临时文件中的位置
+
+        def dump(buf_list):
+            for k in range(len(pos_list)):
+                offset_list[k].append(tmp.tell())
+                pickle.dump(buf_list[k], tmp, protocol=2)
+
+        buf_list = [[] for _ in pos_list]
+        count = 0
+        for row in itertools.islice(itertools.chain([header], rows), max(begin, 0), None):
+            size = len(row)
+            for k in range(len(pos_list)):
+                j = pos_list[k][1]
+                buf_list[k].append(row[j] if j < size else '')  # 缺失的单元格补空
+            count += 1
+            if count == chunk_size:
+                dump(buf_list)
+                buf_list = [[] for _ in pos_list]
+                count = 0
+        if count:
+            dump(buf_list)
+
+        for k in range(len(pos_list)):
+            column = []
+            for offset in offset_list[k]:
+                tmp.seek(offset)
+                column.extend(pickle.load(tmp))
+            yield pos_list[k][0], tuple(column)
+
+
+def read_csv_file(file_path, name_list=[], category='', begin=1, export_type='dict', encoding=None,
+                  dialect='excel'):
     """
     read only one .csv file and obtain the specific content
 
@@ -216,52 +913,93 @@ def read_csv_file(file_path, name_list=[], category='', begin=1, export_type='di
     :param name_list: 1d list, consists of names
     :param category: string, process by rows or columns
     :param begin: int, the beginning position of a row or column list, but invalid when name_list is []
-    :param export_type: string, denote the type of data
+    :param export_type: string, denote the type of data, including dict, list and columns,
+                        columns returns {name: numpy array} whose dtype is inferred, see column_memory
+    :param encoding: string, the code of this file, None means the default of the system
+    :param dialect: string or csv.Dialect, the same as csv.reader
     :return: dict or 2d list, result from this csv file
     """
 
-    assert np.array(name_list).ndim == 1
+    assert _check_dim(name_list, 1)
     assert isinstance(category, str)
     assert isinstance(begin, int)
     assert isinstance(export_type, str)
 
-    result = {} if export_type == 'dict' else []
+    result = {} if export_type in ['dict', 'columns'] else []
     try:
-        import csv
-        with open(file_path, 'r') as f:
-            info_list = list(csv.reader(f))  # iter to list
+        if export_type == 'columns':  # {列名: numpy 数组}，一次读取并推断每列的类型
+            import itertools
+            rows = _csv_rows(file_path, encoding, dialect)
+            header = next(rows, None)
+            if header is None:
+                return result
+
+            if name_list:
+                pos_list = _header_index(header, name_list)
+            else:
+                pos_list = [(str(cell).strip(), j) for j, cell in enumerate(header)]
+
+            builder_list = [_ColumnBuilder() for _ in pos_list]
+            for row in itertools.islice(itertools.chain([header], rows), max(begin, 0), None):
+                size = len(row)
+                for k in range(len(pos_list)):
+                    j = pos_list[k][1]
+                    builder_list[k].add(row[j] if j < size else '')
+
+            lossy_list = [k for k in range(len(pos_list)) if builder_list[k].lossy]
+            if lossy_list:  # 先解析成数字后又变成字符串的列，重新读取原始文本
+                for k in lossy_list:
+                    builder_list[k] = _ColumnBuilder()
+                    builder_list[k]._promote('str')
+                for row in itertools.islice(_csv_rows(file_path, encoding, dialect), max(begin, 0), None):
+                    size = len(row)
+                    for k in lossy_list:
+                        j = pos_list[k][1]
+                        builder_list[k].add(row[j] if j < size else '')
+
+            for k in range(len(pos_list)):
+                result[pos_list[k][0]] = builder_list[k].to_array()
 
-        if not info_list:
             return result
 
-        row_num = len(info_list)
-        col_num = len(info_list[0])  # csv模块读取的每行元素具有相同的长度
         if name_list:  # 有指定名称，说明要导出 n 行或 n 列
-            if category in ['col', 'row']:
-                if category == 'col':
-                    info_list = [tuple([info_list[i][j] for i in range(row_num)]) for j in range(col_num)]
-                    length = col_num
-                else:   # category == 'row'
-                    info_list = [tuple(tmp) for tmp in info_list]
-                    length = row_num
+            if category == 'col':  # 一次读取，只保留需要的列
+                rows = _csv_rows(file_path, encoding, dialect)
+                header = next(rows, None)
+                if header is None:
+                    return result
+
+                pos_list = _header_index(header, name_list)
+                col_list = [[header[pos]] for _, pos in pos_list]
+                for row in rows:
+                    size = len(row)
+                    for k in range(len(pos_list)):
+                        j = pos_list[k][1]
+                        col_list[k].append(row[j] if j < size else '')  # 与表格切片一样，缺失的单元格补空
+
+                for k in range(len(pos_list)):
+                    if isinstance(result, dict):
+                        result[pos_list[k][0]] = tuple(col_list[k][begin:])
+                    else:  # list
+                        result.append(tuple(col_list[k][begin:]))
+
+            elif category == 'row':  # 一次读取，只保留每个名称第一次出现的行
+                name_coll = set(name_list)
+                row_dict = {}
+                for row in _csv_rows(file_path, encoding, dialect):
+                    if row and row[0].strip() in name_coll and row[0].strip() not in row_dict:
+                        row_dict[row[0].strip()] = tuple(row)
 
                 for name in name_list:
-                    pos = -1
-                    for k in range(length):
-                        if info_list[k][0].strip() == name:
-                            pos = k
-                            break
-
-                    if pos >= 0:
+                    if name in row_dict:
                         if isinstance(result, dict):
-                            result[name] = info_list[pos][begin:]
+                            result[name] = row_dict[name][begin:]
                         else:  # list
-                            result.append(info_list[pos][begin:])
+                            result.append(row_dict[name][begin:])
 
             else:  # table slice [(col1, col2, col3),] 每一行元素按照 name_list 的顺序排列,每一行是元组
-                tmp_data = read_csv_file(file_path=file_path, name_list=name_list,
-                                         category='col', begin=begin, export_type='list')
-                tmp_list = list(zip(*tmp_data))
+                tmp_list = list(iter_csv_file(file_path, name_list=name_list, begin=begin,
+                                              encoding=encoding, dialect=dialect))
 
                 if isinstance(result, dict):
                     result['slice'] = tmp_list
@@ -269,10 +1007,24 @@ def read_csv_file(file_path, name_list=[], category='', begin=1, export_type='di
                     result = tmp_list
 
         else:  # 没有指定名称，返回全部表格数据
-            if category == 'col':  # 返回多列构成的二维列表
-                info_list = [tuple([info_list[i][j] for i in range(row_num)]) for j in range(col_num)]
+            if category == 'col':  # 返回多列构成的二维列表，一次读取直接按列保存，不再同时持有行和列两份数据
+                info_list = None
+                for row in _csv_rows(file_path, encoding, dialect):
+                    if info_list is None:
+                        info_list = [[] for _ in row]  # 列数由第一行决定
+                    size = len(row)
+                    for j in range(len(info_list)):
+                        info_list[j].append(row[j] if j < size else '')  # 与表格切片一样，缺失的单元格补空
+
+                if info_list is None:
+                    return result
+
+                for j in range(len(info_list)):  # 逐列转换成元组，同时只多占用一列
+                    info_list[j] = tuple(info_list[j])
             else:
-                info_list = [tuple(tmp) for tmp in info_list]
+                info_list = [tuple(row) for row in _csv_rows(file_path, encoding, dialect)]
+                if not info_list:
+                    return result
 
             if isinstance(result, dict):
                 result['csv_data'] = info_list
@@ -285,30 +1037,129 @@ def read_csv_file(file_path, name_list=[], category='', begin=1, export_type='di
     return result
 
 
-def write_csv_file(info_list, file_path, mode='w', category='row'):
+class _BufferedOutput(object):
+    """
+    text output that joins small writes into blocks of about buffer_size characters before encoding them.
+    with atomic=True the data goes to a temp file in the same directory, which replaces file_path only when
+    everything is written, so a crash never leaves a truncated file. it counts records and bytes for stats.
+    paths ending with .gz, .bz2 or .xz are compressed, appending to them adds a new compressed stream
+    """
+
+    def __init__(self, file_path, mode='w', encoding=None, buffer_size=1 << 20, atomic=False, compress_level=-1):
+        import codecs
+        import locale
+        import os
+        import time
+
+        assert mode in ('w', 'a')
+        assert isinstance(buffer_size, int) and buffer_size > 0
+
+        self.file_path = file_path
+        self.buffer_size = buffer_size
+        self.records = 0
+        self.bytes = 0
+        self._buf = []
+        self._buf_len = 0
+        self._tmp_path = None
+        self._start = time.time()
+
+        encoding = encoding or locale.getpreferredencoding(False)
+        self._encoder = codecs.getincrementalencoder(encoding)()
+        appending = mode == 'a' and os.path.isfile(file_path) and os.path.getsize(file_path) > 0
+        kind = _compress_kind(file_path, detect=appending)
+
+        if atomic:
+            import shutil
+            import tempfile
+
+            folder, name = os.path.split(os.path.abspath(file_path))
+            if os.path.exists(file_path):
+                fd, self._tmp_path = tempfile.mkstemp(prefix='.' + name + '.', suffix='.tmp', dir=folder)
+                os.close(fd)
+                shutil.copymode(file_path, self._tmp_path)
+                if mode == 'a':  # 追加模式先复制原有内容
+                    shutil.copyfile(file_path, self._tmp_path)
+            else:  # 新文件按 0o666 创建，由 umask 决定权限，与普通 open 相同；不能修改进程的 umask
+                import uuid
+                while self._tmp_path is None:
+                    tmp_path = os.path.join(folder, '.%s.%s.tmp' % (name, uuid.uuid4().hex[:8]))
+                    try:
+                        os.close(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+                    except FileExistsError:
+                        continue
+                    self._tmp_path = tmp_path
+            self._file = _open_file(self._tmp_path, mode + 'b', kind=kind, level=compress_level)
+        else:
+            self._file = _open_file(file_path, mode + 'b', kind=kind, level=compress_level)
+
+        if appending:  # 追加时不再写入 BOM
+            if hasattr(self._encoder, 'setstate'):
+                self._encoder.setstate(0)
+
+    def write(self, text):
+        self._buf.append(text)
+        self._buf_len += len(text)
+        if self._buf_len >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._buf:
+            data = self._encoder.encode(''.join(self._buf))
+            self._file.write(data)
+            self.bytes += len(data)
+            self._buf = []
+            self._buf_len = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        import os
+
+        try:
+            if exc_type is None:
+                self.flush()
+                data = self._encoder.encode('', final=True)
+                self._file.write(data)
+                self.bytes += len(data)
+        finally:
+            self._file.close()
+
+        if self._tmp_path is not None:
+            if exc_type is None:
+                os.replace(self._tmp_path, self.file_path)
+            else:  # 写入失败时保留原文件
+                os.remove(self._tmp_path)
+
+    def stats(self):
+        """
+        :return: dict, records, bytes, seconds, records per second and bytes per second
+        """
+
+        import time
+
+        seconds = time.time() - self._start
+        return {'records': self.records, 'bytes': self.bytes, 'seconds': seconds,
+                'records_per_second': self.records / seconds if seconds > 0 else 0.0,
+                'bytes_per_second': self.bytes / seconds if seconds > 0 else 0.0}
+
+
+def write_csv_file(info_list, file_path, mode='w', category='row', encoding=None, buffer_size=1 << 20,
+                   atomic=False, compress_level=-1):
     """
-    write .csv file with organized input
+    write .csv file with organized input, rows are written through a buffer so any iterable of rows works
 
-    :param info_list: 2d list, consists of all information
+    :param info_list: 2d list or iterable of rows (category='row'), consists of all information
     :param file_path: string, the path of this file
     :param mode: string, including w and a, generally we use w
     :param category: string, insert by rows or columns
-    :return: no essential return value
+    :param encoding: string, the code of this file, None means the default of the system
+    :param buffer_size: int, the number of characters collected before one write to the disk
+    :param atomic: bool, write to a temp file and replace file_path when all rows are written
+    :param compress_level: int, the compression level for .gz, .bz2 and .xz paths, -1 means the default of the codec
+    :return: dict, records, bytes, seconds, records per second and bytes per second, None when it fails
     """
 
-    def transpose(input_list):
-        col_num = len(input_list)
-        size = max([len(tmp) for tmp in input_list])
-        for j in range(col_num):  # padding
-            length = len(input_list[j])
-            if length < size:
-                input_list[j].extend(['' for _ in range(size - length)])
-
-        rev_list = [[input_list[j][i] for j in range(col_num)] for i in range(size)]
-
-        return rev_list
-
-    assert isinstance(info_list, list)
     assert isinstance(mode, str)
     assert isinstance(category, str)
 
@@ -317,11 +1168,16 @@ def write_csv_file(info_list, file_path, mode='w', category='row'):
         if category == 'row':
             tmp_list = info_list
         else:    # col
-            tmp_list = transpose(info_list)
+            assert isinstance(info_list, list)
+            tmp_list = _transpose_rows(info_list, '')  # 不再改动输入的列表
 
-        with open(file_path, mode, newline='') as wr:
+        with _BufferedOutput(file_path, mode, encoding, buffer_size, atomic, compress_level) as wr:
             writer = csv.writer(wr)
-            writer.writerows(tmp_list)
+            for row in tmp_list:
+                writer.writerow(row)
+                wr.records += 1
+
+        return wr.stats()
 
     except Exception as err:
         print(err)
@@ -337,33 +1193,516 @@ def read_txt_file(file_path, n_num=-1, code_type='utf-8'):
     :return: string, text
     """
 
-    with open(file_path, 'r', encoding=code_type) as f:
+    with _open_file(file_path, 'r', encoding=code_type, kind='auto') as f:
         if n_num <= 0:
             text = f.read().strip()
         else:  # n_num > 0
-            text = '\n'.join([f.readline() for _ in range(n_num)])
+            text = ''.join([f.readline() for _ in range(n_num)])  # readline 已经带有 '\n'
 
     return text
 
 
-def write_txt_file(text_list, file_path, mode='w', code_type='utf-8'):
+class TxtLineReader(object):
+    """
+    memory-mapped .txt reader with an index of line offsets, so any range of lines can be read without
+    reading the lines before it. the index is an array('Q') of the byte offset where each line starts,
+    it can be saved and loaded again as long as the file is not changed.
+    only encodings in which b'\\n' always means a new line are supported, e.g. utf-8 and gbk, not utf-16.
+    a compressed file (.gz, .bz2, .xz) is decompressed once into an anonymous temp file which is mapped instead
+    """
+
+    def __init__(self, file_path, code_type='utf-8', index_path=None):
+        """
+        :param file_path: string, the path of this file, compressed files are detected by the magic bytes
+        :param code_type: string, the code of this file
+        :param index_path: string, the path of the saved index, it is built and saved when missing or outdated
+        """
+
+        import mmap
+        import os
+
+        assert 'utf-16' not in code_type.lower() and 'utf-32' not in code_type.lower()
+
+        self.file_path = file_path
+        self.code_type = code_type
+        stat = os.stat(file_path)
+        self._stamp = (stat.st_size, stat.st_mtime_ns)  # 压缩文件以压缩后的文件为准
+        kind = _compress_kind(file_path)
+        if kind is None:
+            self._file = open(file_path, 'rb')
+        else:
+            import shutil
+            import tempfile
+            self._file = tempfile.TemporaryFile()
+            with _open_file(file_path, 'rb', kind=kind) as f:
+                shutil.copyfileobj(f, self._file, 1 << 20)
+            self._file.flush()
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+
+        self.offsets = None
+        if index_path is not None and os.path.exists(index_path):
+            self.offsets = self._load_index(index_path)
+        if self.offsets is None:
+            self.offsets = self._build_index()
+            if index_path is not None:
+                self.save_index(index_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.size:
+            self._mm.close()
+        self._file.close()
+
+    def _build_index(self, block_size=1 << 26):
+        """
+        find every b'\\n' with numpy block by block, the index ends with the size of the file
+        """
+
+        from array import array
+        import numpy as np
+
+        offsets = array('Q', [0] if self.size else [])
+        for begin in range(0, self.size, block_size):
+            block = np.frombuffer(self._mm[begin:begin + block_size], dtype=np.uint8)
+            pos = np.flatnonzero(block == 10) + (begin + 1)  # 下一行的开头
+            offsets.frombytes(pos.astype(np.uint64).tobytes())
+
+        if offsets and offsets[-1] == self.size:  # 文件以 '\n' 结尾时没有多出的空行
+            offsets.pop()
+        if self.size:
+            offsets.append(self.size)
+
+        return offsets
+
+    def _load_index(self, index_path):
+        from array import array
+        offsets = array('Q')
+        with open(index_path, 'rb') as f:
+            offsets.frombytes(f.read())
+
+        if len(offsets) < 2 or (offsets[0], offsets[1]) != self._stamp:  # 文件已经改变
+            return None
+
+        return offsets[2:]
+
+    def save_index(self, index_path):
+        """
+        save the index with the size and the modified time of the file
+
+        :param index_path: string, the path of the index
+        :return: no essential return value
+        """
+
+        from array import array
+        with open(index_path, 'wb') as wr:
+            array('Q', self._stamp).tofile(wr)
+            self.offsets.tofile(wr)
+
+    def __len__(self):
+        return max(len(self.offsets) - 1, 0)
+
+    def _line(self, i):
+        line = self._mm[self.offsets[i]:self.offsets[i + 1]]
+        if line.endswith(b'\n'):
+            line = line[:-1]
+        if line.endswith(b'\r'):
+            line = line[:-1]
+
+        return line.decode(self.code_type)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('line index out of range')
+
+        return self._line(i)
+
+    def iter_lines(self, begin=0, end=-1):
+        """
+        decode lines [begin, end) one by one
+
+        :param begin: int, the first line
+        :param end: int, the line after the last one, -1 means the end of this file
+        :return: generator, lines without '\\n'
+        """
+
+        size = len(self)
+        end = size if end < 0 else min(end, size)
+        for i in range(max(begin, 0), end):
+            yield self._line(i)
+
+    def lines(self, begin=0, end=-1):
+        """
+        :param begin: int, the first line
+        :param end: int, the line after the last one, -1 means the end of this file
+        :return: 1d list, lines without '\\n'
+        """
+
+        return list(self.iter_lines(begin, end))
+
+    def split(self, part_num):
+        """
+        split lines into part_num ranges of about the same size, for workers reading one file
+
+        :param part_num: int, the number of parts
+        :return: 2d list, [(begin, end),]
+        """
+
+        assert isinstance(part_num, int) and part_num > 0
+
+        size = len(self)
+        return [(size * k // part_num, size * (k + 1) // part_num) for k in range(part_num)]
+
+
+def write_txt_file(text_list, file_path, mode='w', code_type='utf-8', buffer_size=1 << 20, atomic=False,
+                   compress_level=-1):
     """
-    write text to .txt files in the disk, attention: text_list has been organized well by 1d list
+    write text to .txt files in the disk, attention: text_list has been organized well by 1d list.
+    lines are written through a buffer so any iterable of strings works, e.g. a generator
 
-    :param text_list: 1d list, it consists of organized information
+    :param text_list: 1d list or iterable of strings, it consists of organized information
     :param file_path: string, the path of this file
     :param mode: string, including w and a, generally we use w
     :param code_type: string, the code of this file
-    :return: no essential return value
+    :param buffer_size: int, the number of characters collected before one write to the disk
+    :param atomic: bool, write to a temp file and replace file_path when all lines are written
+    :param compress_level: int, the compression level for .gz, .bz2 and .xz paths, -1 means the default of the codec
+    :return: dict, records, bytes, seconds, records per second and bytes per second
     """
 
-    assert np.array(text_list).ndim == 1
+    import itertools
+
+    if isinstance(text_list, (list, tuple)):
+        assert _check_dim(text_list, 1)
     assert isinstance(mode, str)
 
-    with open(file_path, mode, encoding=code_type) as wr:
-        wr.write('\n'.join(text_list) + '\n')
-                            
+    with _BufferedOutput(file_path, mode, code_type, buffer_size, atomic, compress_level) as wr:
+        it = iter(text_list)
+        batch = list(itertools.islice(it, 1024))
+        while batch:  # 按批拼接，减少逐行调用的开销
+            wr.write('\n'.join(batch) + '\n')
+            wr.records += len(batch)
+            batch = list(itertools.islice(it, 1024))
+        if not wr.records:  # 与原先 '\n'.join([]) + '\n' 的结果一致
+            wr.write('\n')
+
+    return wr.stats()
+
+
+def _file_batches(file_path, batch_size, sheet_var=0, encoding=None, code_type='utf-8'):
+    """
+    read one file of any supported type and yield its records in lists of batch_size,
+    .txt gives lines without '\\n', .csv gives tuples of cells, .xls and .xlsx give lists of cells of one sheet
+    """
+
+    import itertools
+
+    ext = _strip_compress_ext(file_path).lower()
+    if ext.endswith('.txt'):
+        f = _open_file(file_path, 'r', encoding=code_type, kind='auto')
+        records = (line.rstrip('\r\n') for line in f)
+    elif ext.endswith('.csv'):
+        f = None
+        records = iter_csv_file(file_path, encoding=encoding)
+    elif ext.endswith(('.xls', '.xlsx', '.xlsm')):
+        f = ExcelReader(file_path)
+        records = f.iter_all(sheet_var)
+    else:
+        raise ValueError('no such file type')
+
+    try:
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                break
+            yield batch
+    finally:
+        if f is not None:
+            f.close()
+
+
+def _ingest_worker(task_queue, out_queue, kwargs):
+    """
+    take paths from task_queue until None, put (path, batch, None) or (path, None, error) into out_queue
+    """
+
+    import pickle
+
+    while True:
+        file_path = task_queue.get()
+        if file_path is None:
+            out_queue.put(None)  # 该进程结束
+            break
+
+        try:
+            for batch in _file_batches(file_path, **kwargs):
+                out_queue.put((file_path, batch, None))
+        except Exception as err:
+            try:
+                pickle.dumps(err)
+            except Exception:
+                err = RuntimeError(repr(err))
+            out_queue.put((file_path, None, err))
+
+
+def iter_files(path_var, workers=4, batch_size=0, sheet_var=0, encoding=None, code_type='utf-8', queue_size=16):
+    """
+    read many .txt, .csv, .xls and .xlsx files (compressed or not) as one stream of records tagged with their
+    source file. files are read by a pool of processes, each file by one process in order, and at most
+    queue_size batches wait in memory. records of different files are interleaved in the order they are read.
+    a file that fails gives one (file_path, None, error) instead of printing the error, the records read before
+    the failure are kept
+
+    :param path_var: string or 1d list, a glob pattern (** is recursive) or the paths of files
+    :param workers: int, the number of processes, 0 or 1 reads the files in this process one by one
+    :param batch_size: int, yield (file_path, list of records, None) when it is positive, else one record each time
+    :param sheet_var: string or int, the sheet of excel files
+    :param encoding: string, the code of .csv files, None means the default of the system
+    :param code_type: string, the code of .txt files
+    :param queue_size: int, the max number of batches waiting for the consumer
+    :return: generator, (file_path, record, None) or (file_path, None, error)
+    """
+
+    assert isinstance(workers, int)
+    assert isinstance(batch_size, int)
+    assert isinstance(queue_size, int) and queue_size > 0
+
+    if isinstance(path_var, str):
+        import glob
+        path_list = sorted(glob.glob(path_var, recursive=True))
+    else:
+        assert _check_dim(path_var, 1)
+        path_list = list(path_var)
+
+    kwargs = {'batch_size': batch_size if batch_size > 0 else 1000, 'sheet_var': sheet_var,
+              'encoding': encoding, 'code_type': code_type}
+
+    def results():
+        if workers <= 1 or len(path_list) <= 1:  # 单进程顺序读取
+            for file_path in path_list:
+                try:
+                    for batch in _file_batches(file_path, **kwargs):
+                        yield file_path, batch, None
+                except Exception as err:
+                    yield file_path, None, err
+            return
+
+        import multiprocessing
+        import queue
+        task_queue = multiprocessing.Queue()
+        out_queue = multiprocessing.Queue(queue_size)  # 限制等待的批次数，控制内存
+        proc_num = min(workers, len(path_list))
+        for file_path in path_list:
+            task_queue.put(file_path)
+        for _ in range(proc_num):
+            task_queue.put(None)
+
+        proc_list = [multiprocessing.Process(target=_ingest_worker, args=(task_queue, out_queue, kwargs),
+                                             daemon=True) for _ in range(proc_num)]
+        for proc in proc_list:
+            proc.start()
+
+        try:
+            running = proc_num
+            while running:
+                try:
+                    item = out_queue.get(timeout=1.0)
+                except queue.Empty:
+                    if not any([proc.is_alive() for proc in proc_list]):  # 进程异常退出，不再等待
+                        break
+                    continue
+
+                if item is None:
+                    running -= 1
+                else:
+                    yield item
+        finally:  # 提前停止迭代时结束所有进程
+            for proc in proc_list:
+                if proc.is_alive():
+                    proc.terminate()
+            for proc in proc_list:
+                proc.join()
+
+    for file_path, batch, err in results():
+        if err is not None or batch_size > 0:
+            yield file_path, batch, err
+        else:
+            for record in batch:
+                yield file_path, record, None
+
 
+ASYNC_WORKERS = 4  # 异步接口默认线程池的大小，也就是同时读写的文件数上限
+_async_executor = None
 
 
+def _get_async_executor():
+    global _async_executor
+    if _async_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _async_executor = ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix='rw-async')
+
+    return _async_executor
+
+
+async def _run_async(func, args, kwargs, executor):
+    """
+    run a blocking function in the executor, the executor bounds how many of them run at the same time
+    """
+
+    import asyncio
+    import functools
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or _get_async_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def read_csv_file_async(file_path, *args, executor=None, **kwargs):
+    """
+    async version of read_csv_file, the parsing runs in executor so the event loop is not blocked
+
+    :param executor: concurrent.futures.Executor, None means a shared thread pool of ASYNC_WORKERS threads,
+                     a ProcessPoolExecutor also works and returns the result by pickling
+    :return: the same as read_csv_file
+    """
+
+    return await _run_async(read_csv_file, (file_path,) + args, kwargs, executor)
+
+
+async def read_xls_file_async(file_path, *args, executor=None, **kwargs):
+    """
+    async version of read_xls_file, see read_csv_file_async
+    """
+
+    return await _run_async(read_xls_file, (file_path,) + args, kwargs, executor)
+
+
+async def write_xls_file_async(info_list, file_path, *args, executor=None, **kwargs):
+    """
+    async version of write_xls_file, see read_csv_file_async
+    """
+
+    return await _run_async(write_xls_file, (info_list, file_path) + args, kwargs, executor)
+
+
+class _AsyncBatches(object):
+    """
+    async iterator over the batches of a blocking generator, each batch is read in executor (one thread at a time).
+    the generator, and so its file, is closed when the iteration ends, fails or is cancelled, when aclose() is
+    called (e.g. by contextlib.aclosing or async with) or when this object is released after a break.
+    if a batch is being read at that moment, the generator is closed right after it
+    """
+
+    def __init__(self, gen, executor=None):
+        self._gen = gen
+        self._executor = executor or _get_async_executor()
+        self._future = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        import asyncio
+
+        self._future = self._executor.submit(next, self._gen, None)
+        try:
+            batch = await asyncio.wrap_future(self._future)
+        except BaseException:  # 被取消或者读取出错
+            self.close()
+            raise
+
+        if batch is None:
+            self.close()
+            raise StopAsyncIteration
+
+        return batch
+
+    def close(self):
+        gen, future = self._gen, self._future
+        if future is None or future.done() or future.cancel():
+            gen.close()
+        else:  # 线程仍在读取，读完这一批后再关闭
+            future.add_done_callback(lambda _: gen.close())
+
+    async def aclose(self):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+
+def _xls_batches(file_path, sheet_var, name_list, begin, batch_size):
+    reader = ExcelReader(file_path)
+    rows = reader.iter_rows(sheet_var, name_list, begin, batch_size)
+    try:
+        for batch in rows:
+            yield batch
+    finally:  # 先结束行的迭代，表单占用的文件才会释放
+        rows.close()
+        reader.close()
+
+
+def iter_csv_file_async(file_path, name_list=[], begin=1, batch_size=1000, encoding=None, dialect='excel',
+                        executor=None, **fmtparams):
+    """
+    async iterator of row batches of a .csv file, the same rows as iter_csv_file.
+    use it with: async for batch in iter_csv_file_async(...), the file is closed when the loop ends, breaks
+    or is cancelled
+
+    :param batch_size: int, the number of rows of each batch, must be positive
+    :param executor: concurrent.futures.ThreadPoolExecutor, None means the shared thread pool
+    :return: async iterator, lists of tuples of cells
+    """
+
+    assert isinstance(batch_size, int) and batch_size > 0
+
+    gen = iter_csv_file(file_path, name_list, begin, batch_size, encoding, dialect, **fmtparams)
+    return _AsyncBatches(gen, executor)
+
+
+def iter_xls_file_async(file_path, sheet_var=0, name_list=[], begin=1, batch_size=1000, executor=None):
+    """
+    async iterator of row batches of a .xls or .xlsx file, the same rows as ExcelReader.iter_rows.
+    the workbook is opened in the executor too, and closed when the iteration stops or is cancelled
+
+    :param batch_size: int, the number of rows of each batch, must be positive
+    :param executor: concurrent.futures.ThreadPoolExecutor, None means the shared thread pool
+    :return: async iterator, lists of tuples of cells
+    """
 
+    assert isinstance(batch_size, int) and batch_size > 0
+
+    return _AsyncBatches(_xls_batches(file_path, sheet_var, name_list, begin, batch_size), executor)
+
+
+if __name__ == '__main__':
+    '''
+    partial test
+    '''
+    import os
+    import random
+    import tempfile
+
+    random.seed(0)
+    line_list = [''.join(random.choice('ab中 ') for _ in range(random.randint(0, 6))) for _ in range(500)]
+    with tempfile.TemporaryDirectory() as dir_path:
+        for name in ['lines.txt', 'lines.txt.gz']:  # TxtLineReader 与 read_txt_file 对比
+            file_path = os.path.join(dir_path, name)
+            write_txt_file(line_list, file_path)
+            text = read_txt_file(file_path, n_num=len(line_list) + 1)
+            with TxtLineReader(file_path) as reader:
+                assert reader.lines() == text.split('\n')[:-1]
+                assert reader.lines(100, 120) == reader.lines()[100:120]
+        print('TxtLineReader agrees with read_txt_file')
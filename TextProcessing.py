@@ -1,5 +1,46 @@
 import re
-import numpy as np  # 有时用来判断列表维度，若无该库，请把 assert np.array(list).ndim == num 注释！
+import sys
+
+# numpy 只在真正用到的函数中导入；维度检查不再复制整个列表
+TRUSTED_INPUT = False  # 设为 True 时跳过输入的维度检查
+
+
+def _check_dim(input_list, ndim):
+    """
+    cheap replacement of np.array(input_list).ndim == ndim, only looks at the first element instead of copying.
+    attention: an empty list is regarded as 1d, the same as np.array([]).ndim.
+    arrays (anything with an ndim attribute, e.g. numpy arrays) are checked by their own ndim
+
+    :param input_list: list, tuple or array, the input
+    :param ndim: int, 1 or 2
+    :return: bool, denote whether the input looks like a ndim list
+    """
+
+    if TRUSTED_INPUT:
+        return True
+
+    if hasattr(input_list, 'ndim'):  # 数组自带维度，不需要导入 numpy
+        return input_list.ndim == ndim
+
+    if not isinstance(input_list, (list, tuple)):
+        return False
+
+    if not input_list:
+        return ndim == 1
+
+    first = input_list[0]
+    if ndim == 1:
+        return not isinstance(first, (list, tuple))
+    else:  # ndim == 2
+        return isinstance(first, (list, tuple)) and not (first and isinstance(first[0], (list, tuple)))
+
+# 预编译的正则，避免每次调用时重复查找缓存
+_re_sen = re.compile('([。！？\.!?]+)')  # 用来分割句子的符号
+_re_num = re.compile('[0-9０１２３４５６７８９]+')
+_re_tag = re.compile('<[^<>]*>')
+_re_cdata = re.compile('<![\S]CDATA[\S]|]]>')
+_re_comment = re.compile('<!--|-->')
+_re_entity = re.compile('&#?\w+;')
 
 
 def split_sentence(cont):
@@ -12,8 +53,19 @@ def split_sentence(cont):
 
     assert isinstance(cont, str)
 
-    re_sen = re.compile('([。！？\.!?]+)')  # 用来分割句子的符号
-    re_num = re.compile('[0-9０１２３４５６７８９]+')
+    if _result_cache is not None:  # 见 set_cache
+        return _result_cache.call('split_sentence', (), cont, _split_sentence)
+
+    return _split_sentence(cont)
+
+
+def _split_sentence(cont):
+    """
+    the uncached body of split_sentence
+    """
+
+    re_sen = _re_sen
+    re_num = _re_num
     sentence_list = []
     tmp_list = re_sen.split(cont)  # 注意，即便分句的标点在首尾，使用 re.split 后列表中的首尾元素会是空字符
     tmp_str = ''
@@ -35,7 +87,59 @@ def split_sentence(cont):
                 sentence_list.append(tmp_str)
                 tmp_str = ''
 
-    return sentence_list	
+    return sentence_list
+
+
+def split_sentence_iter(chunks, chunk_size=1 << 16):
+    """
+    streaming version of split_sentence, yield sentences one by one from text chunks or a file object.
+    the result is exactly the same as split_sentence(''.join(chunks)), memory only holds the current sentence
+
+    :param chunks: iterable of string, or a file object opened in text mode, or a single string
+    :param chunk_size: int, the size of each read when chunks is a file object
+    :return: generator, sentences which are from text
+    """
+
+    assert isinstance(chunk_size, int) and chunk_size > 0
+
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+    elif hasattr(chunks, 'read'):  # 文件对象按固定大小读取，避免超长行
+        chunks = iter(lambda f=chunks: f.read(chunk_size), '')
+
+    re_sen = _re_sen  # 与 split_sentence 共用同一套断句规则
+    re_num = _re_num
+    buf = ''  # 从当前未结束句子的开头开始
+    scan = 0  # 下一次查找断句符号的起点
+
+    for chunk in chunks:
+        assert isinstance(chunk, str)
+        if not chunk:
+            continue
+
+        buf += chunk
+        size = len(buf)
+        start = 0
+        scan_next = size
+        for m in re_sen.finditer(buf, scan):
+            end = m.end()
+            if end == size:  # 断句符号在末尾，可能和下一块连在一起，留到下一次
+                scan_next = m.start()
+                break
+
+            if m.group() == '.':  # 小数点的情况，前后都是数字则不断句
+                pos = m.start()
+                if pos > 0 and re_num.match(buf[pos-1]) and re_num.match(buf[end]):
+                    continue
+
+            yield buf[start:end]
+            start = end
+
+        buf = buf[start:]
+        scan = scan_next - start
+
+    if buf:  # 最后一部分没有断句符号也要当作一个句子
+        yield buf
 
 
 def sentence_to_article(input_list):
@@ -46,7 +150,7 @@ def sentence_to_article(input_list):
     :return: 1d list, consists of those articles
     """
 
-    assert np.array(input_list).ndim == 2
+    assert _check_dim(input_list, 2)
 
     length = len(input_list)
     article_list = []
@@ -74,6 +178,29 @@ def sentence_to_article(input_list):
     return article_list
 
 
+def sentence_to_article_iter(input_list, key=None, columns=(1,), sep='\n'):
+    """
+    streaming version of sentence_to_article, merge consecutive sentences with the same attributes and
+    yield each article as soon as the next attribute appears, e.g. rows from read_csv_file
+
+    :param input_list: iterable, consists of records whose first element is the sentence
+    :param key: function, get the attribute from a record, None means using columns
+    :param columns: 1d list, indexes of attribute columns, several columns are compared together
+    :param sep: string, the separator between sentences
+    :return: generator, articles
+    """
+
+    import itertools
+    import operator
+
+    if key is None:
+        assert len(columns) > 0
+        key = operator.itemgetter(*columns)  # 多列时返回元组
+
+    for _, group in itertools.groupby(input_list, key=key):
+        yield sep.join([record[0] for record in group])
+
+
 def get_position(cont, ch):
     """
     get the position of a character in a string content
@@ -103,6 +230,338 @@ def get_position(cont, ch):
     return pos_list
 
 
+class TermMatcher(object):
+    """
+    find all occurrences of many terms in one pass with the Aho-Corasick automaton,
+    positions are half-open (start, end) like get_position. states are kept in flat lists so it can be pickled
+    """
+
+    def __init__(self, term_list=()):
+        """
+        :param term_list: iterable, consists of terms, empty terms are ignored
+        """
+
+        self.term_list = []
+        self.goto_list = [{}]  # 第 i 个状态的转移 {character: state}
+        self.fail_list = [0]
+        self.term_index = [-1]  # 以第 i 个状态结尾的词的序号，-1 表示没有
+        self.out_list = [[]]  # 第 i 个状态能匹配到的所有词的序号，包括后缀链接上的
+        self._built = True
+        self.update(term_list)
+
+    def __len__(self):
+        return len(self.term_list)
+
+    def __getstate__(self):  # 序列化前补全失败链接，子进程加载后不用重建
+        if not self._built:
+            self._build()
+        return self.__dict__
+
+    def update(self, term_list):
+        """
+        add terms to the trie, the failure links are rebuilt at the next search or when it is pickled
+
+        :param term_list: iterable, consists of terms
+        :return: int, the number of new terms
+        """
+
+        num = 0
+        for term in term_list:
+            assert isinstance(term, str)
+            if not term:
+                continue
+
+            state = 0
+            for ch in term:
+                nxt = self.goto_list[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto_list)
+                    self.goto_list[state][ch] = nxt
+                    self.goto_list.append({})
+                    self.fail_list.append(0)
+                    self.term_index.append(-1)
+                state = nxt
+
+            if self.term_index[state] == -1:  # 重复的词只保存一次
+                self.term_index[state] = len(self.term_list)
+                self.term_list.append(term)
+                self._built = False
+                num += 1
+
+        return num
+
+    def _build(self):
+        """
+        compute failure links and merge outputs by breadth first search
+        """
+
+        from collections import deque
+        out_list = [[k] if k >= 0 else [] for k in self.term_index]
+        queue = deque(self.goto_list[0].values())  # 第一层的失败链接指向根
+
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto_list[state].items():
+                fail = self.fail_list[state]
+                while fail and ch not in self.goto_list[fail]:
+                    fail = self.fail_list[fail]
+                fail = self.goto_list[fail].get(ch, 0)
+                self.fail_list[nxt] = fail
+                out_list[nxt] = out_list[nxt] + out_list[fail]  # fail 更浅，已经合并过
+                queue.append(nxt)
+
+        self.out_list = out_list
+        self._built = True
+
+    def search(self, cont, overlapping=True, longest=True):
+        """
+        find occurrences of all terms
+
+        :param cont: string, input string
+        :param overlapping: bool, return all occurrences, or only non-overlapping ones chosen from left to right
+        :param longest: bool, when not overlapping, choose the longest or the shortest term at the same start
+        :return: 2d list, [(start, end, term),] sorted by start
+        """
+
+        assert isinstance(cont, str)
+
+        if not self._built:
+            self._build()
+
+        goto_list = self.goto_list
+        fail_list = self.fail_list
+        out_list = self.out_list
+        term_list = self.term_list
+        pos_list = []
+        state = 0
+
+        for i, ch in enumerate(cont):
+            while state and ch not in goto_list[state]:
+                state = fail_list[state]
+            state = goto_list[state].get(ch, 0)
+
+            for k in out_list[state]:
+                term = term_list[k]
+                pos_list.append((i + 1 - len(term), i + 1, term))
+
+        if overlapping:
+            pos_list.sort(key=lambda e: (e[0], e[1]))
+            return pos_list
+
+        # leftmost, 同一起点取最长(或最短)的词，然后从它的结尾继续
+        pos_list.sort(key=lambda e: (e[0], -e[1] if longest else e[1]))
+        result = []
+        end = 0
+        for pos in pos_list:
+            if pos[0] >= end:
+                result.append(pos)
+                end = pos[1]
+
+        return result
+
+
+class SuffixIndex(object):
+    """
+    suffix array index over a fixed text, get_position queries cost O(m log n) instead of scanning the text.
+    the text is kept as utf-32 codes, the suffix array and lcp array are numpy arrays,
+    all of them are saved as .npy files and can be memory-mapped by load()
+    """
+
+    def __init__(self, cont='', build_lcp=False):
+        """
+        :param cont: string, the text to index
+        :param build_lcp: bool, denote whether to build the lcp array, which is needed by longest_repeat()
+        """
+
+        assert isinstance(cont, str)
+
+        import numpy as np
+        self.codes = np.frombuffer(cont.encode('utf-32-le'), dtype='<u4')
+        self.sa = self._build_sa(self.codes)
+        self.lcp = self._build_lcp(cont, self.sa) if build_lcp else None
+
+    def __len__(self):
+        return len(self.codes)
+
+    @staticmethod
+    def _build_sa(codes):
+        """
+        prefix doubling, sort suffixes by the ranks of their first k and next k characters
+        """
+
+        import numpy as np
+        size = len(codes)
+        dtype = np.int32 if size < 2 ** 31 else np.int64
+        if size == 0:
+            return np.empty(0, dtype=dtype)
+
+        rank = np.unique(codes, return_inverse=True)[1].astype(np.int64)  # 压缩到 [0, n)
+        k = 1
+        while True:
+            second = np.zeros(size, dtype=np.int64)  # 0 表示后缀已经结束，比任何字符都小
+            second[:size-k] = rank[k:] + 1
+            key = rank * (size + 1) + second
+            sa = np.argsort(key, kind='stable')
+            sorted_key = key[sa]
+            rank = np.empty(size, dtype=np.int64)
+            rank[sa] = np.concatenate(([0], np.cumsum(sorted_key[1:] != sorted_key[:-1])))
+            if rank[sa[-1]] == size - 1 or k >= size:  # 所有后缀的排名都不同
+                return sa.astype(dtype)
+            k *= 2
+
+    @staticmethod
+    def _build_lcp(cont, sa):
+        """
+        Kasai's algorithm, lcp[i] is the longest common prefix of the suffixes sa[i-1] and sa[i]
+        """
+
+        import numpy as np
+        size = len(sa)
+        rank = np.empty(size, dtype=np.int64)
+        rank[sa] = np.arange(size)
+        lcp = np.zeros(size, dtype=sa.dtype)
+        h = 0
+        for i in range(size):
+            r = rank[i]
+            if r == 0:
+                h = 0
+                continue
+
+            j = int(sa[r - 1])
+            while i + h < size and j + h < size and cont[i + h] == cont[j + h]:
+                h += 1
+            lcp[r] = h
+            if h > 0:
+                h -= 1
+
+        return lcp
+
+    def _prefix(self, pos, length):
+        return self.codes[pos:pos + length].tobytes().decode('utf-32-le')
+
+    def _range(self, ch):
+        """
+        binary search the range [low, high) of suffixes which start with ch
+        """
+
+        length = len(ch)
+        low, high = 0, len(self.sa)
+        while low < high:  # 第一个 >= ch 的后缀
+            mid = (low + high) // 2
+            if self._prefix(int(self.sa[mid]), length) < ch:
+                low = mid + 1
+            else:
+                high = mid
+
+        begin = low
+        high = len(self.sa)
+        while low < high:  # 第一个前缀 > ch 的后缀
+            mid = (low + high) // 2
+            if self._prefix(int(self.sa[mid]), length) == ch:
+                low = mid + 1
+            else:
+                high = mid
+
+        return begin, low
+
+    def count(self, ch):
+        """
+        count all occurrences of ch, overlapping ones included
+
+        :param ch: string, a character or a word
+        :return: int, the number of occurrences
+        """
+
+        assert isinstance(ch, str)
+
+        if not ch:
+            return 0
+
+        begin, end = self._range(ch)
+
+        return end - begin
+
+    def positions(self, ch, overlapping=False):
+        """
+        get the positions of ch, the same as get_position when overlapping is False
+
+        :param ch: string, a character or a word
+        :param overlapping: bool, denote whether to keep occurrences which overlap the previous one
+        :return: 2d list, consists of elements of position
+        """
+
+        assert isinstance(ch, str)
+
+        if not ch:
+            return []
+
+        import numpy as np
+        begin, end = self._range(ch)
+        length = len(ch)
+        pos_list = []
+        last = 0
+        for pos in np.sort(self.sa[begin:end]).tolist():
+            if overlapping or pos >= last:
+                pos_list.append((pos, pos + length))
+                last = pos + length
+
+        return pos_list
+
+    def longest_repeat(self):
+        """
+        the longest substring which occurs at least twice, needs the lcp array
+
+        :return: string, the substring
+        """
+
+        assert self.lcp is not None, 'build the index with build_lcp=True'
+
+        if len(self.lcp) == 0:
+            return ''
+
+        import numpy as np
+        r = int(np.argmax(self.lcp))
+
+        return self._prefix(int(self.sa[r]), int(self.lcp[r]))
+
+    def save(self, dir_path):
+        """
+        save the index as .npy files in a directory
+
+        :param dir_path: string, the path of this directory
+        :return: no essential return value
+        """
+
+        import os
+        import numpy as np
+        os.makedirs(dir_path, exist_ok=True)
+        np.save(os.path.join(dir_path, 'codes.npy'), self.codes)
+        np.save(os.path.join(dir_path, 'sa.npy'), self.sa)
+        if self.lcp is not None:
+            np.save(os.path.join(dir_path, 'lcp.npy'), self.lcp)
+
+    @staticmethod
+    def load(dir_path, mmap=True):
+        """
+        load an index saved by save(), memory-mapped files are shared by processes and read on demand
+
+        :param dir_path: string, the path of this directory
+        :param mmap: bool, denote whether to memory-map the arrays instead of reading them
+        :return: SuffixIndex
+        """
+
+        import os
+        import numpy as np
+        mode = 'r' if mmap else None
+        index = SuffixIndex.__new__(SuffixIndex)
+        index.codes = np.load(os.path.join(dir_path, 'codes.npy'), mmap_mode=mode)
+        index.sa = np.load(os.path.join(dir_path, 'sa.npy'), mmap_mode=mode)
+        lcp_path = os.path.join(dir_path, 'lcp.npy')
+        index.lcp = np.load(lcp_path, mmap_mode=mode) if os.path.exists(lcp_path) else None
+
+        return index
+
+
 def clean_text(cont, degree='Normal'):
     """
     清洗文本，去html标签及无用符号
@@ -114,25 +573,470 @@ def clean_text(cont, degree='Normal'):
 
     assert isinstance(cont, str)
 
-    text = re.sub('<[^<>]*>', '', cont)
-    if degree in ['Deeper', 'NoPackage']:
-        text = re.sub('<![\S]CDATA[\S]|]]>', '', text)  # 去掉CDATA封装，保留标签内容
-        text = re.sub('<!--|-->', '', text)  # 去掉注释标签，保留标签内容（规整的注释标签无需使用）
+    if degree not in ['Normal', 'Deeper', 'NoPackage']:
+        print('warning: invalid degree, execute Normal')
+        degree = 'Normal'
+
+    if _result_cache is not None:  # 见 set_cache
+        return _result_cache.call('clean_text', (degree,), cont, _get_cleaner(degree).clean)
+
+    return _get_cleaner(degree).clean(cont)
+
+
+class TextCleaner(object):
+    """
+    reusable version of clean_text, html2text.HTML2Text and regexes are prepared only once,
+    the result of clean() is the same as clean_text with the same degree
+    """
+
+    def __init__(self, degree='Normal', ignore_links=True, ignore_images=True, ignore_tables=True):
+        """
+        :param degree: string, denote the extent of this processing, including Normal, Deeper and NoPackage
+        :param ignore_links: bool, the option of HTML2Text, only used by Deeper
+        :param ignore_images: bool, the option of HTML2Text, only used by Deeper
+        :param ignore_tables: bool, the option of HTML2Text, only used by Deeper
+        """
+
+        assert isinstance(degree, str)
+
+        if degree not in ['Normal', 'Deeper', 'NoPackage']:
+            print('warning: invalid degree, execute Normal')
+            degree = 'Normal'
+
+        self.degree = degree
+        self.ignore_links = ignore_links
+        self.ignore_images = ignore_images
+        self.ignore_tables = ignore_tables
+        self._text_maker = None
+        self._text_maker_state = None
 
         if degree == 'Deeper':
             import html2text
             text_maker = html2text.HTML2Text()
-            text_maker.ignore_links = True
-            text_maker.ignore_images = True
-            text_maker.ignore_tables = True
-            text = text_maker.handle(text)
-            text = re.sub('&#?\w+;', '', text)  # 去特殊无用字符
+            text_maker.ignore_links = ignore_links
+            text_maker.ignore_images = ignore_images
+            text_maker.ignore_tables = ignore_tables
+            self._text_maker_state = dict(text_maker.__dict__)
+            self._text_maker = text_maker
+
+    def __getstate__(self):  # HTML2Text 不一定能序列化，只保存配置，在子进程中重建
+        return {'degree': self.degree, 'ignore_links': self.ignore_links,
+                'ignore_images': self.ignore_images, 'ignore_tables': self.ignore_tables}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _handle(self, text):
+        """
+        run html2text with a clean state, the result is the same as a new HTML2Text instance
+        """
+
+        # 上一次 handle 会残留 outcount、preceding_data 等，恢复初始状态，列表和字典要用新的副本
+        state = self._text_maker.__dict__
+        state.clear()
+        for key, value in self._text_maker_state.items():
+            state[key] = value.copy() if isinstance(value, (list, dict)) else value
+
+        return self._text_maker.handle(text)
+
+    def _strip(self, text):
+        """
+        remove html labels, CDATA and comment signs, skip the regex when the text has nothing to remove
+        """
+
+        if '<' in text:
+            text = _re_tag.sub('', text)
+
+        if self.degree != 'Normal':
+            if ']]>' in text or 'CDATA' in text:
+                text = _re_cdata.sub('', text)  # 去掉CDATA封装，保留标签内容
+
+            if '<!--' in text or '-->' in text:
+                text = _re_comment.sub('', text)  # 去掉注释标签，保留标签内容
+
+        return text
+
+    def clean(self, cont):
+        """
+        clean one text
+
+        :param cont: string, original text
+        :return: string, new text without html labels or useless signs
+        """
+
+        assert isinstance(cont, str)
+
+        text = self._strip(cont)
+        if self.degree == 'Deeper':
+            text = self._handle(text)
+            if '&' in text:
+                text = _re_entity.sub('', text)  # 去特殊无用字符
+
+        return text.strip()
+
+    def clean_stream(self, chunks, chunk_size=1 << 16):
+        """
+        clean a large html text chunk by chunk, ''.join of the result is the same as clean() of the whole text.
+        Normal and NoPackage only keep a few characters between chunks,
+        Deeper still needs the whole text because html2text wraps the final output
+
+        :param chunks: iterable of string, or a file object opened in text mode
+        :param chunk_size: int, the size of each read when chunks is a file object
+        :return: generator, pieces of the cleaned text
+        """
+
+        assert isinstance(chunk_size, int) and chunk_size > 0
+
+        if isinstance(chunks, str):
+            chunks = (chunks,)
+        elif hasattr(chunks, 'read'):
+            chunks = iter(lambda f=chunks: f.read(chunk_size), '')
+
+        pieces = _stream_sub(chunks, _re_tag, 0)
+        if self.degree != 'Normal':
+            pieces = _stream_sub(pieces, _re_cdata, 9)  # 该正则最长匹配 9 个字符
+            pieces = _stream_sub(pieces, _re_comment, 4)
+
+        if self.degree == 'Deeper':
+            text = self._handle(''.join(pieces))
+            text = _re_entity.sub('', text).strip()
+            if text:
+                yield text
+            return
+
+        # 与 strip() 一致: 丢弃开头的空白，结尾的空白先保留，后面有内容时再输出
+        started = False
+        space = ''
+        for piece in pieces:
+            if not started:
+                piece = piece.lstrip()
+                if not piece:
+                    continue
+                started = True
+
+            body = piece.rstrip()
+            if body:
+                yield space + body
+                space = piece[len(body):]
+            else:
+                space += piece
 
-    else:
-        if degree != 'Normal':
-            print('warning: invalid degree, execute Normal')
 
-    return text.strip()
+def _stream_sub(chunks, pattern, max_len):
+    """
+    remove the matches of pattern from a stream of text, no match crosses the boundary of two output pieces
+
+    :param chunks: iterable of string
+    :param pattern: compiled regex
+    :param max_len: int, the max length of a match, 0 means the html label pattern '<[^<>]*>'
+    :return: generator, pieces of text
+    """
+
+    buf = ''
+    for chunk in chunks:
+        if not chunk:
+            continue
+
+        buf += chunk
+        if max_len:  # 末尾 max_len-1 个字符可能是匹配的一部分
+            cut = max(len(buf) - max_len + 1, 0)
+            for m in pattern.finditer(buf):
+                if m.end() > cut:
+                    cut = min(cut, m.start())
+                    break
+        else:  # 最后一个 '<' 之后没有 '>' 时，标签可能还没结束
+            cut = buf.rfind('<')
+            if cut == -1 or buf.find('>', cut) != -1:
+                cut = len(buf)
+
+        if cut > 0:
+            yield pattern.sub('', buf[:cut])
+            buf = buf[cut:]
+
+    if buf:
+        yield pattern.sub('', buf)
+
+
+_cleaner_dict = {}  # 每个进程中各个 degree 的 TextCleaner 只构造一次
+
+
+def _get_cleaner(degree):
+    """
+    get the shared TextCleaner of current process
+    """
+
+    cleaner = _cleaner_dict.get(degree)
+    if cleaner is None:
+        cleaner = TextCleaner(degree)
+        _cleaner_dict[degree] = cleaner
+
+    return cleaner
+
+
+CACHE_VERSION = 1  # 清洗或分句规则有代码之外的改动时（例如 html2text 的选项）手动加一，使旧缓存失效
+_result_cache = None
+
+
+def _rules_fingerprint():
+    """
+    hash of everything that decides the results of clean_text and split_sentence: the regexes, the bytecode
+    of the functions, the version of html2text and CACHE_VERSION. changing any of them invalidates the cache
+    """
+
+    import hashlib
+
+    h = hashlib.blake2b(digest_size=8)
+    h.update(repr(CACHE_VERSION).encode('utf-8'))
+    for pattern in [_re_sen, _re_num, _re_tag, _re_cdata, _re_comment, _re_entity]:
+        h.update(pattern.pattern.encode('utf-8'))
+
+    for func in [_split_sentence, TextCleaner.__init__, TextCleaner._handle, TextCleaner._strip, TextCleaner.clean]:
+        code = func.__code__
+        h.update(code.co_code)
+        h.update(repr([c for c in code.co_consts if isinstance(c, (str, bytes, int, float, tuple))]).encode('utf-8'))
+
+    try:
+        import html2text
+        h.update(repr(html2text.__version__).encode('utf-8'))
+    except ImportError:
+        pass
+
+    return h.hexdigest()
+
+
+class ResultCache(object):
+    """
+    result cache of clean_text and split_sentence keyed by a 128-bit blake2b hash of the input, the function,
+    its parameters and the fingerprint of the rules. recent results are kept in an in-process LRU bounded by
+    max_bytes; with db_path they are also stored in a sqlite3 file which several processes can share.
+    when the rules change, old entries never match again and the sqlite3 file is emptied when it is opened.
+    one cache can be used by many threads and by forked processes.
+    enable it for clean_text and split_sentence by set_cache(ResultCache(...))
+    """
+
+    def __init__(self, max_bytes=64 << 20, db_path=None, commit_size=256):
+        """
+        :param max_bytes: int, the estimated max bytes of the in-process LRU
+        :param db_path: string, the path of the sqlite3 file, None means no persistent store
+        :param commit_size: int, the number of new results written to sqlite3 in one transaction
+        """
+
+        import collections
+        import os
+        import threading
+
+        assert isinstance(max_bytes, int) and max_bytes > 0
+        assert isinstance(commit_size, int) and commit_size > 0
+
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.commit_size = commit_size
+        self.fingerprint = _rules_fingerprint()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        self._lru = collections.OrderedDict()  # {key: (value, size)}
+        self._pending = []
+        self._db = None
+        self._pid = os.getpid()
+        self._lock = threading.RLock()  # LRU、计数、_pending 和 sqlite3 连接都在锁内使用，线程池中可以共用
+        if db_path is not None:
+            with self._lock:
+                self._connect()
+
+    def _check_fork(self):
+        """
+        a forked worker can not use the lock and the sqlite3 connection of its parent, make new ones,
+        and flush its own pending results when the worker exits normally
+        """
+
+        import os
+        import threading
+
+        if self._pid != os.getpid():
+            self._lock = threading.RLock()
+            self._db = None
+            self._pending = []  # 父进程未提交的结果不属于这个进程
+            self._pid = os.getpid()
+            if self.db_path is not None:  # 子进程正常退出时把未提交的结果写入 sqlite3
+                import multiprocessing.util
+                multiprocessing.util.Finalize(None, self.flush, exitpriority=10)
+
+    def _connect(self):
+        """
+        the sqlite3 connection of current process, shared by its threads, only used with the lock held
+        """
+
+        import sqlite3
+
+        if self._db is not None:
+            return self._db
+
+        db = sqlite3.connect(self.db_path, timeout=60, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')  # 多个进程同时读写
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute('CREATE TABLE IF NOT EXISTS cache (key BLOB PRIMARY KEY, value BLOB)')
+        db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        row = db.execute("SELECT value FROM meta WHERE name = 'rules'").fetchone()
+        if row is None or row[0] != self.fingerprint:  # 规则已改变，旧结果全部作废
+            with db:
+                db.execute('DELETE FROM cache')
+                db.execute("INSERT OR REPLACE INTO meta VALUES ('rules', ?)", (self.fingerprint,))
+        self._db = db
+
+        return db
+
+    def _key(self, name, params, cont):
+        import hashlib
+
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr((name, params, self.fingerprint)).encode('utf-8'))
+        h.update(cont.encode('utf-8', 'surrogatepass'))
+
+        return h.digest()
+
+    @staticmethod
+    def _copy(value):
+        return list(value) if isinstance(value, list) else value  # 列表结果给调用者一个副本
+
+    def _remember(self, key, value):
+        """
+        put a result into the LRU, only called with the lock held
+        """
+
+        size = sys.getsizeof(value) + 100  # 100: 键和字典项的大致开销
+        if isinstance(value, list):
+            size += sum([sys.getsizeof(tmp) for tmp in value])
+        if size > self.max_bytes:
+            return
+
+        old = self._lru.pop(key, None)  # 两个线程可能同时算出同一个结果
+        if old is not None:
+            self.size -= old[1]
+
+        self._lru[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, old_size) = self._lru.popitem(last=False)
+            self.size -= old_size
+            self.evictions += 1
+
+    def call(self, name, params, cont, func):
+        """
+        get the result of func(cont) from the cache, or compute and store it.
+        func runs outside the lock, so threads compute different inputs at the same time
+
+        :param name: string, the name of the function
+        :param params: tuple, the parameters which change the result
+        :param cont: string, the input
+        :param func: function, computes the result from cont
+        :return: the result of func(cont)
+        """
+
+        import pickle
+
+        self._check_fork()
+        key = self._key(name, params, cont)
+        with self._lock:
+            item = self._lru.get(key)
+            if item is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return self._copy(item[0])
+
+            if self.db_path is not None:
+                row = self._connect().execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    value = pickle.loads(row[0])
+                    self.disk_hits += 1
+                    self._remember(key, value)
+                    return self._copy(value)
+
+            self.misses += 1
+
+        value = func(cont)
+        with self._lock:
+            self._remember(key, self._copy(value))
+            if self.db_path is not None:
+                self._pending.append((key, pickle.dumps(value, protocol=2)))
+                if len(self._pending) >= self.commit_size:
+                    self.flush()
+
+        return value
+
+    def flush(self):
+        """
+        write the pending results to sqlite3
+
+        :return: no essential return value
+        """
+
+        self._check_fork()
+        with self._lock:
+            if self._pending:
+                db = self._connect()
+                with db:
+                    db.executemany('INSERT OR REPLACE INTO cache VALUES (?, ?)', self._pending)
+                self._pending = []
+
+    def clear(self):
+        """
+        drop all results in memory and in sqlite3, counters are kept
+
+        :return: no essential return value
+        """
+
+        self._check_fork()
+        with self._lock:
+            self._lru.clear()
+            self.size = 0
+            self._pending = []
+            if self.db_path is not None:
+                db = self._connect()
+                with db:
+                    db.execute('DELETE FROM cache')
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+            self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def stats(self):
+        """
+        :return: dict, hits, disk_hits, misses, evictions, hit_rate, items and bytes of the LRU
+        """
+
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'hit_rate': (self.hits + self.disk_hits) / total if total else 0.0,
+                    'items': len(self._lru), 'bytes': self.size}
+
+
+def set_cache(cache):
+    """
+    let clean_text and split_sentence (and everything built on them) use cache, forked worker processes
+    inherit it. remember to flush() or close() the cache at the end so the last results reach sqlite3
+
+    :param cache: ResultCache, None turns caching off
+    :return: ResultCache, the previous cache
+    """
+
+    global _result_cache
+    previous = _result_cache
+    _result_cache = cache
+
+    return previous
 
 
 def remove_empty(input_list, category='Both'):
@@ -189,7 +1093,7 @@ def de_weight_list(input_list, seq_flag=True):
     :return: 1d list, consists of string content after de-weight
     """
 
-    assert np.array(input_list).ndim == 1
+    assert _check_dim(input_list, 1)
 
     if not seq_flag:
         return list(set(input_list))
@@ -205,6 +1109,270 @@ def de_weight_list(input_list, seq_flag=True):
         return result
 
 
+def _item_bytes(item):
+    """
+    bytes used for hashing an item
+    """
+
+    if isinstance(item, str):
+        return item.encode('utf-8')
+    elif isinstance(item, bytes):
+        return item
+    else:
+        import pickle
+        return pickle.dumps(item, protocol=2)
+
+
+class ExactDeduper(object):
+    """
+    streaming exact de-weight which keeps the first-seen order like de_weight_list(seq_flag=True).
+    only 8-byte hashes of items are kept in memory, after max_items hashes new items are spilled
+    to partition files on disk by hash, de-weighted partition by partition and merged back in order.
+    the hashes of spilled items are kept on disk too, so a deduper reused by later dedup() calls still
+    removes them. two different items with the same 64-bit blake2b hash are regarded as duplicates, which is very unlikely
+    """
+
+    def __init__(self, max_items=10000000, partition_num=64, tmp_dir=None):
+        """
+        :param max_items: int, the max number of hashes kept in memory
+        :param partition_num: int, the number of partition files when spilling
+        :param tmp_dir: string, the directory of partition files, None means the system temp directory
+        """
+
+        assert isinstance(max_items, int) and max_items > 0
+        assert isinstance(partition_num, int) and partition_num > 0
+
+        self.max_items = max_items
+        self.partition_num = partition_num
+        self.tmp_dir = tmp_dir
+        self.input_count = 0
+        self.removed_count = 0
+        self.spilled_count = 0
+        self._seen = set()
+        self._key_dir = None  # 写到磁盘上的哈希，每个分区一个文件，多次 dedup() 共用
+
+    @staticmethod
+    def _hash(item):
+        import hashlib
+        return int.from_bytes(hashlib.blake2b(_item_bytes(item), digest_size=8).digest(), 'little')
+
+    def memory_size(self):
+        """
+        :return: int, the estimated bytes of the hashes kept in memory
+        """
+
+        import sys
+        return sys.getsizeof(self._seen) + len(self._seen) * sys.getsizeof(1 << 63)
+
+    def dedup(self, input_list):
+        """
+        de-weight items of an iterable
+
+        :param input_list: iterable, consists of string content or other picklable items
+        :return: generator, items after de-weight
+        """
+
+        import os
+        import pickle
+        import tempfile
+
+        seen = self._seen
+        index = 0
+        tmp_path = None
+        part_list = []
+        try:
+            for item in input_list:
+                index += 1
+                self.input_count += 1
+                key = self._hash(item)
+                if key in seen:
+                    self.removed_count += 1
+                elif len(seen) < self.max_items:
+                    seen.add(key)
+                    yield item
+                else:  # 内存已满，写到磁盘上按哈希分区，最后再去重
+                    if tmp_path is None:
+                        tmp_path = tempfile.mkdtemp(dir=self.tmp_dir)
+                        part_list = [open(os.path.join(tmp_path, '%d.part' % k), 'w+b')
+                                     for k in range(self.partition_num)]
+                    pickle.dump((index, key, item), part_list[key % self.partition_num], protocol=2)
+                    self.spilled_count += 1
+
+            if part_list:
+                for item in self._merge_parts(part_list):
+                    yield item
+
+        finally:
+            for f in part_list:
+                f.close()
+            if tmp_path is not None:
+                import shutil
+                shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _merge_parts(self, part_list):
+        """
+        de-weight every partition, then merge them by the original index
+        """
+
+        import heapq
+        import os
+        import pickle
+        from array import array
+
+        if self._key_dir is None:
+            import shutil
+            import tempfile
+            import weakref
+            self._key_dir = tempfile.mkdtemp(dir=self.tmp_dir)
+            weakref.finalize(self, shutil.rmtree, self._key_dir, True)  # 对象回收时删除
+
+        def read_part(f):
+            f.seek(0)
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    break
+
+        for k, f in enumerate(part_list):
+            key_path = os.path.join(self._key_dir, '%d.key' % k)
+            old_keys = array('Q')  # 之前的 dedup() 写到这个分区的哈希
+            if os.path.exists(key_path):
+                with open(key_path, 'rb') as key_file:
+                    old_keys.frombytes(key_file.read())
+            old_keys = set(old_keys)
+
+            first_dict = {}  # 同一分区中只有这一部分的哈希
+            for elem in read_part(f):
+                if elem[1] in first_dict or elem[1] in old_keys:
+                    self.removed_count += 1
+                else:
+                    first_dict[elem[1]] = elem
+
+            with open(key_path, 'ab') as key_file:
+                array('Q', first_dict.keys()).tofile(key_file)
+
+            f.seek(0)
+            f.truncate()
+            for elem in first_dict.values():  # 插入顺序就是 index 的顺序
+                pickle.dump(elem, f, protocol=2)
+            f.flush()
+
+        for elem in heapq.merge(*[read_part(f) for f in part_list], key=lambda e: e[0]):
+            yield elem[2]
+
+
+class NearDeduper(object):
+    """
+    streaming near-duplicate removal by MinHash and LSH, keeps the first-seen order.
+    an item is removed when the estimated Jaccard similarity of its character n-grams with any kept item
+    is not less than threshold
+    """
+
+    def __init__(self, threshold=0.8, num_perm=64, ngram=5, seed=1):
+        """
+        :param threshold: float, the Jaccard similarity regarded as duplicate
+        :param num_perm: int, the number of hash functions of MinHash
+        :param ngram: int, the length of character n-grams
+        :param seed: int, the seed of hash functions
+        """
+
+        assert 0.0 < threshold <= 1.0
+        assert isinstance(num_perm, int) and num_perm > 0
+        assert isinstance(ngram, int) and ngram > 0
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.ngram = ngram
+        import numpy as np
+        rng = np.random.RandomState(seed)
+        prime = (1 << 61) - 1
+        self._a = rng.randint(1, prime, size=num_perm, dtype=np.uint64)  # 取值范围要大，否则各个哈希函数高度相关
+        self._b = rng.randint(0, prime, size=num_perm, dtype=np.uint64)
+
+        # 选择 band 数 b 和每个 band 的行数 r，使 (1/b)^(1/r) 最接近阈值
+        best = None
+        for r in range(1, num_perm + 1):
+            b = num_perm // r
+            diff = abs((1.0 / b) ** (1.0 / r) - threshold)
+            if best is None or diff < best[0]:
+                best = (diff, b, r)
+        self.band_num, self.row_num = best[1], best[2]
+
+        self.input_count = 0
+        self.removed_count = 0
+        self._sig_list = []  # 保留下来的每个元素的签名
+        self._bucket_list = [{} for _ in range(self.band_num)]
+
+    def signature(self, cont):
+        """
+        MinHash signature of a string
+
+        :param cont: string, input string
+        :return: np.ndarray, num_perm uint32 values
+        """
+
+        import zlib
+        import numpy as np
+        n = self.ngram
+        gram_set = {cont[i:i+n] for i in range(max(len(cont) - n + 1, 1))}
+        x = np.fromiter((zlib.crc32(g.encode('utf-8')) for g in gram_set), dtype=np.uint64, count=len(gram_set))
+        value = (self._a[:, None] * x[None, :] + self._b[:, None]) % np.uint64((1 << 61) - 1)  # 溢出回绕也是哈希
+
+        return (value.min(axis=1) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+    def memory_size(self):
+        """
+        :return: int, the estimated bytes of signatures and buckets
+        """
+
+        import sys
+        size = sum(sig.nbytes for sig in self._sig_list)
+        for bucket in self._bucket_list:
+            size += sys.getsizeof(bucket) + sum(sys.getsizeof(tmp) for tmp in bucket.values())
+
+        return size
+
+    def dedup(self, input_list):
+        """
+        remove near duplicates from an iterable of strings
+
+        :param input_list: iterable, consists of string content
+        :return: generator, items after de-weight
+        """
+
+        import numpy as np
+        r = self.row_num
+        for item in input_list:
+            assert isinstance(item, str)
+            self.input_count += 1
+            sig = self.signature(item)
+            key_list = [sig[k*r:(k+1)*r].tobytes() for k in range(self.band_num)]
+
+            duplicate = False
+            checked = set()
+            for bucket, key in zip(self._bucket_list, key_list):
+                for idx in bucket.get(key, ()):
+                    if idx not in checked:
+                        checked.add(idx)
+                        if np.mean(self._sig_list[idx] == sig) >= self.threshold:
+                            duplicate = True
+                            break
+                if duplicate:
+                    break
+
+            if duplicate:
+                self.removed_count += 1
+                continue
+
+            idx = len(self._sig_list)
+            self._sig_list.append(sig)
+            for bucket, key in zip(self._bucket_list, key_list):
+                bucket.setdefault(key, []).append(idx)
+
+            yield item
+
+
 def pack_list(input_list, pack_size=5000):
     """
     列表片段打包
@@ -214,7 +1382,7 @@ def pack_list(input_list, pack_size=5000):
     :return: 2d list  [pack_list, pack_list]
     """
 
-    assert np.array(input_list).ndim == 1
+    assert _check_dim(input_list, 1)
 
     length = len(input_list)
     k = 0
@@ -226,6 +1394,275 @@ def pack_list(input_list, pack_size=5000):
     return result
 
 
+class ListSlice(object):
+    """
+    read-only view of input_list[begin:end] without copying, it is pickled as a normal list
+    """
+
+    __slots__ = ('input_list', 'begin', 'end')
+
+    def __init__(self, input_list, begin, end):
+        self.input_list = input_list
+        self.begin = begin
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.begin
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.input_list[k] for k in range(self.begin, self.end)[i]]
+
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('ListSlice index out of range')
+
+        return self.input_list[self.begin + i]
+
+    def __iter__(self):  # 按下标取，不从头走过前面的元素
+        return map(self.input_list.__getitem__, range(self.begin, self.end))
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __reduce__(self):  # 发送到子进程时只复制这一段
+        return list, (list(self),)
+
+
+def iter_packs(input_list, pack_size=5000):
+    """
+    lazy version of pack_list, works on any iterable.
+    list and tuple give ListSlice views, numpy arrays give array views, other iterables give new lists
+
+    :param input_list: iterable, the whole input
+    :param pack_size: int, the number of a pack
+    :return: generator, packs
+    """
+
+    assert isinstance(pack_size, int) and pack_size > 0
+
+    if isinstance(input_list, (list, tuple)):
+        for begin in range(0, len(input_list), pack_size):
+            yield ListSlice(input_list, begin, min(begin + pack_size, len(input_list)))
+
+    elif 'numpy' in sys.modules and isinstance(input_list, sys.modules['numpy'].ndarray):  # 未导入 numpy 时不可能是数组
+        for begin in range(0, len(input_list), pack_size):
+            yield input_list[begin:begin + pack_size]  # numpy 切片本身就是视图
+
+    else:
+        import itertools
+        it = iter(input_list)
+        while True:
+            pack = list(itertools.islice(it, pack_size))
+            if not pack:
+                break
+            yield pack
+
+
+def _timed_call(func, pack):
+    """
+    run func on a pack in a worker, return (result, error, seconds) instead of raising
+    """
+
+    import time
+    start = time.time()
+    try:
+        return func(pack), None, time.time() - start
+    except Exception as err:
+        return None, err, time.time() - start
+
+
+def _pack_result(item, raise_error):
+    """
+    wait for a submitted pack and unpack its result
+    """
+
+    index, future = item
+    try:
+        result, error, seconds = future.result()
+    except Exception as err:  # 例如 func 或结果无法序列化
+        result, error, seconds = None, err, 0.0
+
+    if error is not None and raise_error:
+        raise error
+
+    return index, result, error, seconds
+
+
+def map_packs(func, input_list, pack_size=5000, workers=4, mode='thread', max_pending=-1, raise_error=True):
+    """
+    apply func to every pack of input_list with a thread or process pool, results keep the order of packs.
+    only max_pending packs are submitted at the same time, so a huge iterable is not read ahead
+
+    :param func: function, called with one pack (a list, or an array view for numpy input), it must be picklable in process mode
+    :param input_list: iterable, the whole input
+    :param pack_size: int, the number of a pack
+    :param workers: int, the number of threads or processes
+    :param mode: string, thread or process
+    :param max_pending: int, the max number of packs in flight, -1 means 2 * workers
+    :param raise_error: bool, raise the first error of func, or return it in the result
+    :return: generator, (pack index, result, error, seconds) of each pack
+    """
+
+    assert isinstance(workers, int) and workers > 0
+    assert mode in ['thread', 'process']
+    assert isinstance(max_pending, int)
+
+    import collections
+    import concurrent.futures
+
+    if max_pending <= 0:
+        max_pending = 2 * workers
+
+    if mode == 'thread':
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+
+    pending = collections.deque()
+    with executor:
+        try:
+            for index, pack in enumerate(iter_packs(input_list, pack_size)):
+                if isinstance(pack, ListSlice):  # func 总是收到普通列表，线程模式与进程模式一致
+                    pack = list(pack)
+                pending.append((index, executor.submit(_timed_call, func, pack)))
+                if len(pending) >= max_pending:  # 等最早的一个完成再继续读
+                    yield _pack_result(pending.popleft(), raise_error)
+
+            while pending:
+                yield _pack_result(pending.popleft(), raise_error)
+
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def _alias_table(pair_list, filter_list=()):
+    """
+    build the Walker/Vose alias table in pure python, filtered words are removed and the rest are re-normalized
+
+    :param pair_list: 2d list, it consists of words and their weights   [(word, possibility),]
+    :param filter_list: 1d list, it consists of words which are not expected
+    :return: tuple, (word_list, prob_list, alias_list)
+    """
+
+    filter_coll = set(filter_list)
+    pair_list = [elem for elem in pair_list if elem[1] > 0 and elem[0] not in filter_coll]
+    word_list = [elem[0] for elem in pair_list]
+
+    size = len(pair_list)
+    total = sum([elem[1] for elem in pair_list])
+    prob_list = [elem[1] * size / total for elem in pair_list]  # 均值为 1
+    alias_list = list(range(size))
+    small = [i for i in range(size) if prob_list[i] < 1.0]
+    large = [i for i in range(size) if prob_list[i] >= 1.0]
+
+    while small and large:
+        i = small.pop()
+        j = large.pop()
+        alias_list[i] = j  # i 的格子不满，用 j 补齐
+        prob_list[j] -= 1.0 - prob_list[i]
+        if prob_list[j] < 1.0:
+            small.append(j)
+        else:
+            large.append(j)
+
+    for i in small + large:  # 浮点误差留下的格子都是满的
+        prob_list[i] = 1.0
+
+    return word_list, prob_list, alias_list
+
+
+def _alias_draw(table, random_func, randrange_func):
+    """
+    draw one word from an alias table with the given random functions, None if no word can be drawn
+    """
+
+    word_list, prob_list, alias_list = table
+    if not word_list:
+        return None
+
+    i = randrange_func(len(word_list))
+    if random_func() >= prob_list[i]:
+        i = alias_list[i]
+
+    return word_list[i]
+
+
+class AliasSampler(object):
+    """
+    draw words by their probabilities in O(1) with the Walker/Vose alias table,
+    the table is built once, filtered words are removed and the rest are re-normalized
+    """
+
+    def __init__(self, prob_pair_list, filter_list=(), seed=None):
+        """
+        :param prob_pair_list: 2d list, it consists of words and their weights   [(word, possibility),]
+        :param filter_list: 1d list, it consists of words which are not expected
+        :param seed: int, the seed of random generators, None means a random seed
+        """
+
+        import random
+        self.pair_list = [(elem[0], float(elem[1])) for elem in prob_pair_list]
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.rng = None  # numpy 的生成器和数组在第一次 sample() 时才创建
+        self.set_filter(filter_list)
+
+    def set_filter(self, filter_list):
+        """
+        rebuild the alias table without the words in filter_list
+
+        :param filter_list: 1d list, it consists of words which are not expected
+        :return: no essential return value
+        """
+
+        self.word_list, self.prob_list, self.alias_list = _alias_table(self.pair_list, filter_list)
+        self._prob_array = None
+        self._alias_array = None
+
+    def __len__(self):
+        return len(self.word_list)
+
+    def draw(self):
+        """
+        draw one word
+
+        :return: an eligible word, None if no word can be drawn
+        """
+
+        return _alias_draw((self.word_list, self.prob_list, self.alias_list), self.random.random, self.random.randrange)
+
+    def sample(self, n):
+        """
+        draw n words at once by numpy
+
+        :param n: int, the number of words
+        :return: 1d list, eligible words
+        """
+
+        assert isinstance(n, int) and n >= 0
+
+        if not self.word_list:
+            return []
+
+        import numpy as np
+        if self.rng is None:
+            self.rng = np.random.default_rng(self.seed)
+        if self._prob_array is None:
+            self._prob_array = np.array(self.prob_list, dtype=np.float64)
+            self._alias_array = np.array(self.alias_list, dtype=np.int64)
+
+        index = self.rng.integers(0, len(self.word_list), size=n)
+        index = np.where(self.rng.random(n) < self._prob_array[index], index, self._alias_array[index])
+
+        return [self.word_list[i] for i in index]
+
+
 def occur_by_probability(prob_pair_list, filter_list=[]):
     """
     通过指定的概率生成相应的词语
@@ -235,36 +1672,111 @@ def occur_by_probability(prob_pair_list, filter_list=[]):
     :return: string, an eligible word
     """
 
-    assert np.array(prob_pair_list).ndim == 2
-    assert np.array(filter_list).ndim == 1  # attention the dim value of np.array([]) is also 1
+    assert _check_dim(prob_pair_list, 2)
+    assert _check_dim(filter_list, 1)  # attention the empty list is also 1d
 
     import random
-    result = None
+
     sum_prob = sum([float(elem[1]) for elem in prob_pair_list])
     if round(abs(sum_prob-1.0), 2) > 0.01:  # 保证列表中元素相加为1,但设置一个误差
-        return result  # 有错误则返回None
+        return None  # 有错误则返回None
 
-    filter_coll = set(filter_list)
-    length = len(prob_pair_list)
-    begin = 0
-    tmp_list = []
+    # 过滤后剩下的词按概率重新归一化；所有词都被过滤时返回None。
+    # 使用模块级的 random，random.seed() 之后结果可以复现；需要反复抽取时请直接使用 AliasSampler
+    table = _alias_table([(elem[0], float(elem[1])) for elem in prob_pair_list], filter_list)
 
-    for i in range(length):
-        end = begin + int(100 * float(prob_pair_list[i][1]))
-        tmp_list.append((begin, end))
-        begin = end
-
-    while 1:
-        num = random.randint(1, 100)
-        for i in range(length):
-            if tmp_list[i][0] < num <= tmp_list[i][1]:
-                result = prob_pair_list[i][0]
-                break
+    return _alias_draw(table, random.random, random.randrange)  # 正确则返回选取的那个词
 
-        if result not in filter_coll:
-            break
 
-    return result  # 正确则返回选取的那个词
+class WordCounter(object):
+    """
+    word frequency counter which accepts tokens incrementally, counters built in different processes can be
+    merged into one result, top-k words are selected by a heap instead of sorting the whole vocabulary
+    """
+
+    def __init__(self, input_list=()):
+        """
+        :param input_list: iterable, consists of words or lists of words
+        """
+
+        from collections import Counter
+        self.counter = Counter()
+        self.update(input_list)
+
+    def __len__(self):
+        return len(self.counter)
+
+    def __getitem__(self, word):
+        return self.counter[word]
+
+    def update(self, input_list):
+        """
+        count more words, elements which are list or tuple are regarded as rows of a 2d list
+
+        :param input_list: iterable, consists of words or lists of words
+        :return: WordCounter, self
+        """
+
+        counter = self.counter
+        for tmp in input_list:
+            if isinstance(tmp, (list, tuple)):  # 二维列表的一行，不要求每行长度相同
+                counter.update(tmp)
+            else:
+                counter[tmp] += 1
+
+        return self
+
+    def merge(self, *other_list):
+        """
+        merge counters of other shards into this one
+
+        :param other_list: WordCounter, counters to merge
+        :return: WordCounter, self
+        """
+
+        for other in other_list:
+            self.counter.update(other.counter)
+
+        return self
+
+    def prune(self, min_freq):
+        """
+        drop words whose frequency is less than min_freq
+
+        :param min_freq: int, the min frequency
+        :return: int, the number of dropped words
+        """
+
+        drop_list = [word for word, freq in self.counter.items() if freq < min_freq]
+        for word in drop_list:
+            del self.counter[word]
+
+        return len(drop_list)
+
+    def top(self, k=-1, min_freq=1, rev_flag=True):
+        """
+        get the sorted word-freq list, words with the same frequency keep the order they first appear
+
+        :param k: int, the number of words, -1 means all words
+        :param min_freq: int, ignore words whose frequency is less than it
+        :param rev_flag: bool, denote whether to sort by reverse, which means the most frequent words first
+        :return: 1d list, word-freq list [(word, freq),]
+        """
+
+        assert isinstance(k, int)
+
+        items = self.counter.items()
+        if min_freq > 1:
+            items = [tmp for tmp in items if tmp[1] >= min_freq]
+
+        if k < 0:
+            return sorted(items, key=lambda e: e[1], reverse=rev_flag)
+
+        import heapq
+        if rev_flag:
+            return heapq.nlargest(k, items, key=lambda e: e[1])
+        else:
+            return heapq.nsmallest(k, items, key=lambda e: e[1])
 
 
 def rank_words(input_list, rev_flag=True):
@@ -278,31 +1790,10 @@ def rank_words(input_list, rev_flag=True):
 
     assert isinstance(input_list, list)
 
-    sta_dic = {}
-    tmp_list = []
-    try:
-        if np.array(input_list).ndim == 2:  # 二维列表
-            for i in range(len(input_list)):
-                tmp_list.extend(input_list[i])  # 二维列表转一维列表
-        else:
-            tmp_list = input_list
-
-    except Exception as err:
-        print(err)
-        return []
+    return WordCounter(input_list).top(rev_flag=rev_flag)
 
-    for t in tmp_list:
-        if t not in sta_dic:
-            sta_dic[t] = 1
-        else:
-            sta_dic[t] += 1
-
-    result = sorted(sta_dic.items(), key=lambda e: e[1], reverse=rev_flag)
-
-    return result
 
-
-def string_distance(str_a, str_b):
+def string_distance(str_a, str_b, max_distance=-1):
     """
     两字符串的距离的定义为从前一个字符串通过删除、添加和替换操作需要多少次操作能够变成后一个字符串
     两字符串的距离越大，可认为二者相似度越小
@@ -312,35 +1803,742 @@ def string_distance(str_a, str_b):
     当 str_a[i] != str_b[j] 时,dp_table[i][j] = dp_table[i-1][j]+1 表示 str_a 删除了它最后的字符,
     dp_table[i][j] = dp_table[i][j-1]+1 表示 str_a 插入了 str_b 最后的字符,
     dp_table[i][j] = dp_table[i-1][j-1]+1 表示 str_a 最后的字符 替换成了 str_b 最后的字符
+    实现上不建表，用 Myers/Hyyrö 位并行算法: 把 dp_table 一列中相邻两格的差值(+1/0/-1)压进两个整数的比特位，
+    每读入 str_b 的一个字符只需要常数次位运算就能得到下一列，内存为 O(min(len(str_a), len(str_b)))
+
+    :param str_a: string, the first string
+    :param str_b: string, the second string
+    :param max_distance: int, stop early when the distance must exceed it and return max_distance+1, -1 means no limit
+    :return: int, edit distance of the two strings
+    """
+
+    assert isinstance(max_distance, int)
+
+    len_a = len(str_a)
+    len_b = len(str_b)
+    if 0 <= max_distance < abs(len_a - len_b):  # 长度差就是距离的下界
+        return max_distance + 1
+
+    # 公共前缀和后缀不影响编辑距离
+    begin = 0
+    size = min(len_a, len_b)
+    while begin < size and str_a[begin] == str_b[begin]:
+        begin += 1
+
+    while begin < size and str_a[len_a-1] == str_b[len_b-1]:
+        len_a -= 1
+        len_b -= 1
+        size -= 1
+
+    str_a = str_a[begin:len_a]
+    str_b = str_b[begin:len_b]
+    if len(str_a) > len(str_b):  # 较短的字符串放进比特位
+        str_a, str_b = str_b, str_a
+
+    len_a = len(str_a)
+    len_b = len(str_b)
+    if not str_a:  # 无需动态规划即可得出
+        return len_b if max_distance < 0 or len_b <= max_distance else max_distance + 1
+
+    peq = {}  # 每个字符在 str_a 中出现位置的比特掩码
+    for i, ch in enumerate(str_a):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+
+    mask = (1 << len_a) - 1
+    last = 1 << (len_a - 1)
+    pv = mask  # 竖直方向差值为 +1 的位置
+    mv = 0  # 竖直方向差值为 -1 的位置
+    score = len_a  # dp_table[len_a][j]
+
+    for j in range(len_b):
+        eq = peq.get(str_b[j], 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+
+        if 0 <= max_distance < score - (len_b - j - 1):  # 剩下的字符最多让距离减少这么多
+            return max_distance + 1
+
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+
+    return score if max_distance < 0 or score <= max_distance else max_distance + 1
+
+
+def string_similarity(str_a, str_b, min_similarity=0.0):
+    """
+    normalized similarity based on edit distance, 1 - distance / max length
+
+    :param str_a: string, the first string
+    :param str_b: string, the second string
+    :param min_similarity: float, return 0.0 early when the similarity must be lower than it
+    :return: float, similarity between 0.0 and 1.0
+    """
+
+    assert 0.0 <= min_similarity <= 1.0
+
+    size = max(len(str_a), len(str_b))
+    if not size:
+        return 1.0
+
+    max_distance = int((1.0 - min_similarity) * size + 1e-9) if min_similarity > 0 else -1
+    distance = string_distance(str_a, str_b, max_distance)
+    if 0 <= max_distance < distance:
+        return 0.0
+
+    return 1.0 - float(distance) / size
+
+
+class BKTree(object):
+    """
+    BK-tree index over a vocabulary, find similar words by string_distance without comparing with every word.
+    by the triangle inequality, only children whose edge distance is in [d-k, d+k] can contain an answer.
+    nodes are kept in flat lists so that pickle works for large trees
+    """
+
+    def __init__(self, word_list=()):
+        """
+        :param word_list: iterable, consists of words to insert
+        """
+
+        self.word_list = []  # 第 i 个结点的词
+        self.child_list = []  # 第 i 个结点的孩子 {edge distance: node index}
+        self.query_count = 0
+        self.distance_count = 0  # 查询时实际计算编辑距离的次数
+        self.saved_count = 0  # 与暴力比较相比省下的次数
+        self.last_stats = {'evaluated': 0, 'saved': 0}  # 最近一次 search/nearest 的计算与省下次数
+        self.update(word_list)
+
+    def __len__(self):
+        return len(self.word_list)
+
+    def add(self, word):
+        """
+        insert one word, the same word is stored only once
+
+        :param word: string, a word
+        :return: bool, denote whether the word is new
+        """
+
+        if not self.word_list:
+            self.word_list.append(word)
+            self.child_list.append({})
+            return True
+
+        node = 0
+        while True:
+            distance = string_distance(word, self.word_list[node])
+            if distance == 0:
+                return False
+
+            child = self.child_list[node].get(distance)
+            if child is None:
+                self.child_list[node][distance] = len(self.word_list)
+                self.word_list.append(word)
+                self.child_list.append({})
+                return True
+
+            node = child
+
+    def update(self, word_list):
+        """
+        bulk insert
+
+        :param word_list: iterable, consists of words
+        :return: int, the number of new words
+        """
+
+        num = 0
+        for word in word_list:
+            if self.add(word):
+                num += 1
+
+        return num
+
+    def _count(self, num):
+        self.query_count += 1
+        self.distance_count += num
+        self.saved_count += len(self.word_list) - num
+        self.last_stats = {'evaluated': num, 'saved': len(self.word_list) - num}
+
+    def search(self, word, max_distance):
+        """
+        find all words within max_distance, last_stats tells how many distances were evaluated and saved
+
+        :param word: string, the query
+        :param max_distance: int, the max edit distance
+        :return: 2d list, [(word, distance),] sorted by distance
+        """
+
+        assert isinstance(max_distance, int) and max_distance >= 0
+
+        result = []
+        num = 0
+        stack = [0] if self.word_list else []
+        while stack:
+            node = stack.pop()
+            distance = string_distance(word, self.word_list[node])
+            num += 1
+            if distance <= max_distance:
+                result.append((self.word_list[node], distance))
+
+            for edge, child in self.child_list[node].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+
+        self._count(num)
+        result.sort(key=lambda e: e[1])
+
+        return result
+
+    def nearest(self, word, top_n=1, max_distance=-1):
+        """
+        find the top_n nearest words, the search radius shrinks as better words are found,
+        last_stats tells how many distances were evaluated and saved
+
+        :param word: string, the query
+        :param top_n: int, the number of words
+        :param max_distance: int, the max edit distance, -1 means no limit
+        :return: 2d list, [(word, distance),] sorted by distance
+        """
+
+        assert isinstance(top_n, int) and top_n > 0
+        assert isinstance(max_distance, int)
+
+        import heapq
+        heap = []  # 大顶堆 (-distance, -index)，保存当前最好的 top_n 个
+        radius = max_distance if max_distance >= 0 else float('inf')
+        num = 0
+        stack = [0] if self.word_list else []
+        while stack:
+            node = stack.pop()
+            distance = string_distance(word, self.word_list[node])
+            num += 1
+            if distance <= radius:
+                heapq.heappush(heap, (-distance, -node))
+                if len(heap) > top_n:
+                    heapq.heappop(heap)
+                if len(heap) == top_n:
+                    radius = min(radius, -heap[0][0])
+
+            for edge, child in self.child_list[node].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+
+        self._count(num)
+        result = sorted((-tmp[0], -tmp[1]) for tmp in heap)
+
+        return [(self.word_list[node], distance) for distance, node in result]
+
+    def save(self, file_path):
+        """
+        save this index by pickle
+
+        :param file_path: string, the path of this file
+        :return: no essential return value
+        """
+
+        import pickle
+        with open(file_path, 'wb') as wr:
+            pickle.dump(self, wr, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(file_path):
+        """
+        load an index saved by save()
+
+        :param file_path: string, the path of this file
+        :return: BKTree
+        """
+
+        import pickle
+        with open(file_path, 'rb') as f:
+            return pickle.load(f)
+
+
+def _string_codes(str_list):
+    """
+    code points of all strings in one flat array, encoded once and shared by every query
+
+    :return: tuple, (flat codes, offset of each string, length of each string, indexes sorted by length)
+    """
+
+    import numpy as np
+    size = len(str_list)
+    lengths = np.fromiter((len(tmp) for tmp in str_list), dtype=np.int64, count=size)
+    flat = np.frombuffer(''.join(str_list).encode('utf-32-le'), dtype='<u4').astype(np.int32)
+    offsets = np.zeros(size, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    order = np.argsort(lengths, kind='stable')  # 长度相近的放在一起，减少补齐
+
+    return flat, offsets, lengths, order
+
+
+def _code_distances(query_codes, flat, offsets, lengths, order, block_size):
+    """
+    edit distances between query_codes and the strings in order, every block is padded from the flat codes
+
+    :return: np.ndarray, distance of each string, in the same order as order
+    """
+
+    import numpy as np
+    result = np.empty(len(order), dtype=np.int32)
+    if not query_codes:
+        result[:] = lengths[order]
+        return result
+
+    for k in range(0, len(order), block_size):
+        index = order[k:k+block_size]
+        num = len(index)
+        block_lengths = lengths[index]
+        width = int(block_lengths.max())
+        cols = np.arange(width)
+        pos = np.minimum(offsets[index][:, None] + cols, max(len(flat) - 1, 0))
+        codes = np.where(cols < block_lengths[:, None], flat[pos], -1)  # -1 补齐，不会与任何字符相等
+
+        steps = np.arange(width + 1, dtype=np.int32)
+        prev = np.tile(steps, (num, 1))  # dp_table[0][j] = j
+        for i, code in enumerate(query_codes, 1):
+            tmp = np.minimum(prev[:, :-1] + (codes != code), prev[:, 1:] + 1)  # 替换与删除
+            cur = np.empty_like(prev)
+            cur[:, 0] = i
+            cur[:, 1:] = tmp - steps[1:]
+            np.minimum.accumulate(cur, axis=1, out=cur)  # 插入
+            cur += steps
+            prev = cur
+
+        result[k:k+num] = prev[np.arange(num), block_lengths]
+
+    return result
+
+
+def distance_vector(query, str_list, block_size=4096):
+    """
+    edit distances between one string and many strings, computed by numpy for all of them at once.
+    str_list is processed in blocks of similar length, every character of query updates a whole dp row for
+    the block: cur[j] = min(prev[j-1] + cost, prev[j] + 1, cur[j-1] + 1), where the last term is
+    solved by cur[j] = j + min(i, min(tmp[k] - k for k <= j)) with np.minimum.accumulate
+
+    :param query: string, the query
+    :param str_list: 1d list, consists of strings
+    :param block_size: int, the number of strings computed together, limits the memory
+    :return: np.ndarray, distance of each string in str_list
+    """
+
+    assert isinstance(block_size, int) and block_size > 0
+
+    import numpy as np
+    flat, offsets, lengths, order = _string_codes(str_list)
+    result = np.empty(len(str_list), dtype=np.int32)
+    result[order] = _code_distances([ord(ch) for ch in query], flat, offsets, lengths, order, block_size)
+
+    return result
+
+
+_matrix_codes = None  # 计算距离矩阵的子进程中共享的 _string_codes 结果
+
+
+def _init_matrix_worker(str_list):
+    global _matrix_codes
+    _matrix_codes = _string_codes(str_list)  # 每个进程只编码一次
+
+
+def _matrix_rows(row_range, block_size=4096):
+    """
+    condensed distances of rows [begin, end), row i contains the distances between i and i+1, i+2...
+    """
+
+    import numpy as np
+    flat, offsets, lengths, order = _matrix_codes
+    begin, end = row_range
+    size = len(lengths)
+    part_list = [np.empty(0, dtype=np.int32)]
+    for i in range(begin, end):
+        query_codes = flat[offsets[i]:offsets[i]+lengths[i]].tolist()
+        index = order[order > i]  # 仍按长度排序
+        row = np.empty(size - i - 1, dtype=np.int32)
+        row[index - (i + 1)] = _code_distances(query_codes, flat, offsets, lengths, index, block_size)
+        part_list.append(row)
+
+    return np.concatenate(part_list)
+
+
+def distance_matrix(str_list, condensed=True, workers=1, tile_size=64):
+    """
+    all-pairs edit distances, the condensed form is the same as scipy.spatial.distance.pdist,
+    so it can be passed to scipy.cluster.hierarchy.linkage directly
+
+    :param str_list: 1d list, consists of strings
+    :param condensed: bool, return the condensed vector or the square matrix
+    :param workers: int, the number of processes, 1 means no process pool
+    :param tile_size: int, the number of rows computed by a worker at one time
+    :return: np.ndarray, 1d condensed vector with n*(n-1)/2 elements or 2d n*n matrix
+    """
+
+    assert isinstance(workers, int) and workers > 0
+    assert isinstance(tile_size, int) and tile_size > 0
+
+    global _matrix_codes
+
+    import numpy as np
+    size = len(str_list)
+    tile_list = [(i, min(i + tile_size, size)) for i in range(0, size, tile_size)]
+    if workers == 1:
+        _matrix_codes = _string_codes(str_list)
+        try:
+            part_list = [_matrix_rows(tile) for tile in tile_list]
+        finally:
+            _matrix_codes = None
+
+    else:
+        import multiprocessing
+        with multiprocessing.Pool(processes=workers, initializer=_init_matrix_worker,
+                                  initargs=(str_list,)) as pool:
+            part_list = pool.map(_matrix_rows, tile_list)
+
+    result = np.concatenate(part_list) if part_list else np.empty(0, dtype=np.int32)
+    if condensed:
+        return result
+
+    matrix = np.zeros((size, size), dtype=np.int32)
+    rows, cols = np.triu_indices(size, k=1)  # 与 condensed 的顺序一致
+    matrix[rows, cols] = result
+    matrix[cols, rows] = result
+
+    return matrix
+
+
+def _init_batch_worker(degree):
+    """
+    initialize a worker process, prepare the objects which are expensive to build
+    """
+
+    if degree in ['Normal', 'Deeper', 'NoPackage']:
+        _get_cleaner(degree)
+
+
+def _batch_map(func, doc_list, workers, chunk_size, degree=None):
+    """
+    apply func to every document in a process pool, generator keeps the order of doc_list
+    """
+
+    if workers == 1:  # 不开进程池，直接在当前进程中计算
+        for doc in doc_list:
+            yield func(doc)
+        return
+
+    import multiprocessing
+    pool = multiprocessing.Pool(processes=workers, initializer=_init_batch_worker, initargs=(degree,))
+    try:
+        for result in pool.imap(func, doc_list, chunksize=chunk_size):
+            yield result
+        pool.close()
+        pool.join()  # 让子进程正常退出，set_cache 的缓存在退出时写入 sqlite3
+    finally:
+        pool.terminate()
+
+
+def batch_split_sentence(doc_list, workers=None, chunk_size=64, lazy=False):
     """
-    if not str_a or not str_b:  # 无需动态规划即可得出
-        return max(len(str_a), len(str_b))
+    split sentences of many documents with several processes
+
+    :param doc_list: iterable, consists of string documents
+    :param workers: int, the number of processes, None means the number of cpu, 1 means no process pool
+    :param chunk_size: int, the number of documents sent to a worker at one time
+    :param lazy: bool, denote whether to return a generator instead of a list
+    :return: 2d list or generator, sentence list of each document, in the same order as doc_list
+    """
+
+    assert workers is None or (isinstance(workers, int) and workers > 0)
+    assert isinstance(chunk_size, int) and chunk_size > 0
+
+    result = _batch_map(split_sentence, doc_list, workers, chunk_size)
+
+    return result if lazy else list(result)
+
+
+def batch_clean_text(doc_list, degree='Normal', workers=None, chunk_size=64, lazy=False):
+    """
+    clean many documents with several processes, every worker builds HTML2Text only once
+
+    :param doc_list: iterable, consists of string documents
+    :param degree: string, the same as clean_text, including Normal, Deeper and NoPackage
+    :param workers: int, the number of processes, None means the number of cpu, 1 means no process pool
+    :param chunk_size: int, the number of documents sent to a worker at one time
+    :param lazy: bool, denote whether to return a generator instead of a list
+    :return: 1d list or generator, cleaned text of each document, in the same order as doc_list
+    """
+
+    assert workers is None or (isinstance(workers, int) and workers > 0)
+    assert isinstance(chunk_size, int) and chunk_size > 0
+
+    import functools
+    func = functools.partial(clean_text, degree=degree)
+    result = _batch_map(func, doc_list, workers, chunk_size, degree)
+
+    return result if lazy else list(result)
+
 
-    a = len(str_a) + 1
-    b = len(str_b) + 1
-    dp_table = [[0 for __ in range(b)] for _ in range(a)]
+def _clean_pack(degree, pack):
+    return [clean_text(cont, degree) for cont in pack]  # 每个进程只构建一次 TextCleaner，也会使用 set_cache 的缓存
 
-    # 因为迭代中有 i-1 和 j-1，先求 dp_table[0][j] 和 dp_table[i][0]
-    for i in range(1, a):
-        dp_table[i][0] = dp_table[i-1][0] + 1
 
-    for j in range(1, b):
-        dp_table[0][j] = dp_table[0][j-1] + 1
+def _split_pack(pack):
+    return [split_sentence(cont) for cont in pack]
 
-    for i in range(1, a):
-        ch_a = str_a[i-1]
-        for j in range(1, b):
-            ch_b = str_b[j-1]
-            if ch_a == ch_b:
-                dp_table[i][j] = dp_table[i-1][j-1]
+
+def _func_pack(func, pack):
+    return [func(tmp) for tmp in pack]
+
+
+class TextPipeline(object):
+    """
+    lazy chain of text stages, e.g. read -> clean -> split -> dedup -> rank. nothing runs until the pipeline is
+    iterated, items flow through the stages one by one, so memory does not grow with the corpus.
+    a stage with workers > 1 runs packs of items on a thread or process pool by map_packs, which keeps at most
+    max_pending packs in flight, so it is the bounded queue between this stage and the previous one.
+    every run records the throughput and latency of each stage, see stats()
+    """
+
+    def __init__(self, source=()):
+        """
+        :param source: iterable, consists of string documents, e.g. the lines of a file, or a function returning
+                       such an iterable, which is called at every run. a generator can only be run once
+        """
+
+        self.source = source
+        self._stage_list = []  # [(name, body)]，body 接收上一阶段的迭代器，返回新的迭代器
+        self.stat_list = []
+
+    @classmethod
+    def from_file(cls, file_path, code_type='utf-8'):
+        """
+        a pipeline whose documents are the lines of a text file, read lazily
+
+        :param file_path: string, the path of this file
+        :param code_type: string, the code of this file
+        :return: TextPipeline
+        """
+
+        def read_lines():
+            with open(file_path, 'r', encoding=code_type) as f:
+                for line in f:
+                    yield line.rstrip('\r\n')
+
+        return cls(read_lines)  # 每次运行重新打开文件
+
+    def add(self, name, body):
+        """
+        append a custom stage
+
+        :param name: string, the name shown in stats
+        :param body: function, receives the iterator of the previous stage and returns an iterable
+        :return: TextPipeline, self
+        """
+
+        self._stage_list.append((name, body))
+        return self
+
+    def _map_stage(self, name, item_func, pack_func, workers, mode, pack_size, max_pending, flat):
+        def body(items):
+            if workers <= 1:
+                results = (item_func(tmp) for tmp in items)
             else:
-                val1 = dp_table[i-1][j] + 1  # delete
-                val2 = dp_table[i][j-1] + 1  # insert
-                val3 = dp_table[i-1][j-1] + 1  # substitute
+                import itertools
+                results = itertools.chain.from_iterable(
+                    result for _, result, _, _ in map_packs(pack_func, items, pack_size, workers, mode, max_pending))
+
+            for result in results:
+                if flat:
+                    for tmp in result:
+                        yield tmp
+                else:
+                    yield result
+
+        return self.add(name, body)
+
+    def map(self, func, workers=1, mode='thread', pack_size=256, max_pending=-1, flat=False):
+        """
+        apply func to every item
+
+        :param func: function, called with one item, it must be picklable in process mode
+        :param workers: int, the number of threads or processes, 1 means no pool
+        :param mode: string, thread or process
+        :param pack_size: int, the number of items sent to a worker at one time
+        :param max_pending: int, the max number of packs in flight, -1 means 2 * workers
+        :param flat: bool, denote whether func returns a list whose elements become items
+        :return: TextPipeline, self
+        """
+
+        import functools
+        return self._map_stage('flat_map' if flat else 'map', func, functools.partial(_func_pack, func),
+                               workers, mode, pack_size, max_pending, flat)
+
+    def filter(self, func):
+        """
+        keep items for which func returns True
+
+        :param func: function, called with one item
+        :return: TextPipeline, self
+        """
+
+        return self.add('filter', lambda items: (tmp for tmp in items if func(tmp)))
+
+    def clean(self, degree='Normal', workers=1, mode='process', pack_size=64, max_pending=-1):
+        """
+        clean_text every document, see map for the other parameters
+
+        :param degree: string, the same as clean_text
+        :return: TextPipeline, self
+        """
+
+        import functools
+        if degree not in ['Normal', 'Deeper', 'NoPackage']:
+            print('warning: invalid degree, execute Normal')
+            degree = 'Normal'
+
+        return self._map_stage('clean', functools.partial(clean_text, degree=degree),
+                               functools.partial(_clean_pack, degree), workers, mode, pack_size, max_pending, False)
+
+    def split(self, workers=1, mode='process', pack_size=64, max_pending=-1):
+        """
+        split_sentence every document, the sentences become the items, see map for the parameters
+
+        :return: TextPipeline, self
+        """
+
+        return self._map_stage('split', split_sentence, _split_pack, workers, mode, pack_size, max_pending, True)
+
+    def dedup(self, deduper=None):
+        """
+        de-weight items and keep the first-seen order
+
+        :param deduper: ExactDeduper or NearDeduper, or a function returning a new one, None means ExactDeduper.
+                        every run uses a new deduper (a copy of the given one), so runs do not share seen items
+        :return: TextPipeline, self
+        """
 
-                dp_table[i][j] = min(val1, val2, val3)
+        if deduper is None:
+            make = ExactDeduper
+        elif hasattr(deduper, 'dedup'):
+            import copy
+            import functools
+            template = copy.deepcopy(deduper)  # 保存尚未使用的状态
+            make = functools.partial(copy.deepcopy, template)
+        else:
+            make = deduper
+
+        return self.add('dedup', lambda items: make().dedup(items))
+
+    @staticmethod
+    def _timed(stat, body, upstream, chunk_size=256):
+        """
+        run one stage and record its own time, which excludes the time spent in the previous stages.
+        items are timed in chunks of chunk_size to keep the overhead low, so max_latency is per chunk
+        """
+
+        import itertools
+        import time
+
+        clock = time.perf_counter
+        wait = [0.0]  # 等待上一阶段的时间
+
+        def counted():
+            it = iter(upstream)
+            while True:
+                start = clock()
+                chunk = list(itertools.islice(it, chunk_size))
+                wait[0] += clock() - start
+                if not chunk:
+                    return
+                stat['items_in'] += len(chunk)
+                for item in chunk:
+                    yield item
+
+        out = iter(body(counted()) if upstream is not None else body)
+        while True:
+            start, waited = clock(), wait[0]
+            chunk = list(itertools.islice(out, chunk_size))
+            own = clock() - start - (wait[0] - waited)
+            stat['seconds'] += own
+            stat['max_latency'] = max(stat['max_latency'], own)
+            if not chunk:
+                break
+            stat['items_out'] += len(chunk)
+            for item in chunk:
+                yield item
+
+        if upstream is None:
+            stat['items_in'] = stat['items_out']
+
+    def __iter__(self):
+        self.stat_list = []
+        items = None
+        source = self.source() if callable(self.source) else self.source
+        for name, body in [('read', source)] + self._stage_list:
+            stat = {'name': name, 'items_in': 0, 'items_out': 0, 'seconds': 0.0, 'max_latency': 0.0}
+            self.stat_list.append(stat)
+            items = self._timed(stat, body, items)
+
+        return items
+
+    def run(self):
+        """
+        run the pipeline and drop the items, useful when the last stage writes somewhere
+
+        :return: int, the number of items out of the last stage
+        """
+
+        count = 0
+        for _ in self:
+            count += 1
+
+        return count
+
+    def rank(self, k=-1, min_freq=1, rev_flag=True, tokenize=None):
+        """
+        run the pipeline and count the items (or their words) by WordCounter
+
+        :param k: int, the number of words, -1 means all words
+        :param min_freq: int, ignore words whose frequency is less than it
+        :param rev_flag: bool, denote whether to sort by reverse
+        :param tokenize: function, turns an item into a list of words, None means the item itself is a word
+        :return: 1d list, word-freq list [(word, freq),]
+        """
+
+        counter = WordCounter()
+        if tokenize is None:
+            for tmp in self:
+                counter.counter[tmp] += 1
+        else:
+            for tmp in self:
+                counter.counter.update(tokenize(tmp))
+
+        return counter.top(k, min_freq, rev_flag)
 
-    return dp_table[-1][-1]
+    def stats(self):
+        """
+        statistics of the last run, the stage with the most seconds is the bottleneck
+
+        :return: 1d list, a dict for each stage with name, items_in, items_out, seconds, items_per_second,
+                 latency (average seconds per output item) and max_latency (the longest wait for a chunk)
+        """
+
+        result = []
+        for stat in self.stat_list:
+            stat = dict(stat)
+            stat['items_per_second'] = stat['items_in'] / stat['seconds'] if stat['seconds'] > 0 else 0.0
+            stat['latency'] = stat['seconds'] / stat['items_out'] if stat['items_out'] else 0.0
+            result.append(stat)
+
+        return result
 
 
 if __name__ == '__main__':
@@ -349,6 +2547,7 @@ if __name__ == '__main__':
     '''
     text = '我非常喜欢算法！I am very interested in algorithm.特别是NLP'
     print(split_sentence(text))
+    print(list(split_sentence_iter(['我非常喜欢算法！I am very interested in algorithm 3.', '14.特别是NLP'])))
 
 
     input_list = [('hello world', '1'), ('really', '1'), ('please close the door', '2'), ('end', '2')]
@@ -367,8 +2566,72 @@ if __name__ == '__main__':
     str_a = 'ramble'
     str_b = 'rab'
     print(string_distance(str_a, str_b))
+    print(string_similarity(str_a, str_b))
 
 
-
-
-
+    # 新算法与原来的实现在随机输入上对比
+    import random
+    random.seed(0)
+
+    def full_distance(str_a, str_b):  # 原来的完整 dp_table
+        dp_table = [[i + j if not i or not j else 0 for j in range(len(str_b) + 1)] for i in range(len(str_a) + 1)]
+        for i in range(1, len(str_a) + 1):
+            for j in range(1, len(str_b) + 1):
+                cost = 0 if str_a[i-1] == str_b[j-1] else 1
+                dp_table[i][j] = min(dp_table[i-1][j] + 1, dp_table[i][j-1] + 1, dp_table[i-1][j-1] + cost)
+        return dp_table[-1][-1]
+
+    word_list = [''.join(random.choice('abc中') for _ in range(random.randint(0, 8))) for _ in range(300)]
+    tree = BKTree(word_list)
+    for k in range(300):
+        str_a, str_b = word_list[k], random.choice(word_list)
+        distance = full_distance(str_a, str_b)
+        assert string_distance(str_a, str_b) == distance
+        assert string_distance(str_a, str_b, max_distance=k % 4) == min(distance, k % 4 + 1)
+        assert sorted(tree.search(str_a, k % 3)) == sorted(set((tmp, full_distance(str_a, tmp))
+                                                           for tmp in word_list if full_distance(str_a, tmp) <= k % 3))
+    print('string_distance and BKTree agree with the full dp_table')
+
+    cont = ''.join(random.choice(['。', '！', '？', '3.14', '"', 'NLP', '算法', ' ', '\n']) for _ in range(2000))
+    for k in range(50):
+        cut_list = sorted(random.sample(range(len(cont)), random.randint(0, 20)))
+        chunks = [cont[i:j] for i, j in zip([0] + cut_list, cut_list + [len(cont)])]
+        assert list(split_sentence_iter(chunks)) == split_sentence(cont)
+    print('split_sentence_iter agrees with split_sentence')
+
+    cont = ''.join(random.choice('ab') for _ in range(2000))
+    index = SuffixIndex(cont)
+    for term in ['a', 'ab', 'aba', 'bab', 'aaa', 'abba']:
+        assert TermMatcher([term]).search(cont, overlapping=False) == [(i, j, term) for i, j in get_position(cont, term)]
+        assert [tuple(tmp) for tmp in index.positions(term)] == get_position(cont, term)
+    print('TermMatcher and SuffixIndex agree with get_position')
+
+    input_list = [random.choice(word_list) for _ in range(1000)]
+    assert list(ExactDeduper(max_items=50, partition_num=4).dedup(input_list)) == de_weight_list(input_list)
+    print('ExactDeduper agrees with de_weight_list')
+
+
+
+
+
+
+
+    doc_list = ['<p>我非常喜欢算法！特别是NLP。</p>', '<p>特别是NLP。</p>']
+    pipeline = TextPipeline(doc_list).clean().split().dedup()
+    print(list(pipeline))
+    print(pipeline.stats())
+
+
+    import os
+    import tempfile
+    import threading
+    with tempfile.TemporaryDirectory() as dir_path:
+        with ResultCache(db_path=os.path.join(dir_path, 'cache.sqlite')) as cache:  # 多线程共用一个缓存
+            set_cache(cache)
+            thread_list = [threading.Thread(target=split_sentence, args=(text,)) for _ in range(4)]
+            for thread in thread_list:
+                thread.start()
+            for thread in thread_list:
+                thread.join()
+            print(split_sentence(text), cache.stats())
+            set_cache(None)